@@ -0,0 +1,151 @@
+import os
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from util import metrics
+from util.downloader import DownloadEngine
+from util.manifest import get_manifest
+from util.paper_index import get_index, doi_from_url
+from util.publishers import PUBLISHERS, download_directory
+from util.redirect_cache import resolve_redirect
+
+
+@metrics.timed("get_download_url")
+def get_download_url(url: str, j_type: str) -> str:
+    """
+    Follow redirections for the provided URL and rewrite it into the publisher's PDF URL.
+    """
+    try:
+        clean_url = resolve_redirect(url)
+        return PUBLISHERS[j_type]["pdf_url"](clean_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error processing URL {url}: {e}")
+        metrics.count("get_download_url_errors")
+        return None
+
+
+def create_engine(pool_size: int = 3) -> DownloadEngine:
+    """
+    Create a download engine to be shared across many download() calls, of any publisher.
+    """
+    return DownloadEngine(pool_size=pool_size)
+
+
+@metrics.timed("download")
+def download(url: str, download_dir: str, engine: DownloadEngine = None, j_type: str = "acs"):
+    """
+    Download a PDF from the given URL, with the download strategy of the publisher.
+
+    Parameters:
+        url (str): The direct PDF URL to download.
+        download_dir (str): The directory where the PDF will be saved.
+        engine (DownloadEngine): Shared engine holding the browser pool. If None, a one-off engine is used.
+        j_type (str): Publisher key, selecting whether a direct HTTP fetch is tried first.
+
+    Returns:
+        str: Path of the downloaded file, or None if the download did not complete.
+    """
+    direct = PUBLISHERS[j_type]["direct_download"]
+    if engine is not None:
+        path = engine.download(url, download_dir, direct=direct)
+    else:
+        with create_engine(pool_size=1) as one_off_engine:
+            path = one_off_engine.download(url, download_dir, direct=direct)
+
+    if path:
+        metrics.count("download_bytes", os.path.getsize(path))
+    else:
+        metrics.count("download_errors")
+    return path
+
+
+def _taken_over(record, status):
+    print(f"⏭️ {record['raw_url']} is no longer {status}, another worker has taken it over.")
+    return None
+
+
+def download_link(record: dict, download_dir: str, engine, seen_dois: set = None):
+    """
+    Take one link record from the manifest through resolution, deduplication and download,
+    recording each step in the manifest. A step that fails or raises is recorded with manifest.fail,
+    so the link is retried after a backoff and eventually marked failed.
+
+    Returns:
+        str: Path of the downloaded PDF, or None if the link was skipped or failed.
+    """
+    manifest = get_manifest()
+    index = get_index()
+    j_type = record["j_type"]
+
+    status = record["status"]
+    download_url = record["resolved_url"]
+    if status == "discovered":
+        try:
+            download_url = get_download_url(record["raw_url"], j_type)
+        except Exception as e:
+            print(f"An error occurred while resolving {record['raw_url']}: {e!r}")
+            manifest.fail(record["id"], repr(e))
+            return None
+        if not download_url:
+            manifest.fail(record["id"], "could not resolve the download URL")
+            return None
+        if not manifest.transition(
+            record["id"], status, "resolved", resolved_url=download_url, doi=doi_from_url(download_url)
+        ):
+            return _taken_over(record, status)
+        status = "resolved"
+
+    if not index.new_urls([download_url], seen=seen_dois):
+        if not manifest.transition(record["id"], status, "skipped"):
+            return _taken_over(record, status)
+        metrics.count("links_skipped")
+        return None
+
+    try:
+        path = download(download_url, download_dir, engine, j_type=j_type)
+    except Exception as e:
+        # e.g. Chrome failing to start, or a page load timing out
+        print(f"An error occurred while downloading {download_url}: {e!r}")
+        manifest.fail(record["id"], repr(e))
+        return None
+    if not path:
+        # Stays "resolved" and is retried after a backoff.
+        manifest.fail(record["id"], "download failed")
+        return None
+    if not index.add_download(path, download_url):
+        if not manifest.transition(record["id"], status, "skipped"):
+            return _taken_over(record, status)
+        return None
+    path = os.path.abspath(path)
+    if not manifest.transition(record["id"], status, "downloaded", path=path):
+        return _taken_over(record, status)
+    return path
+
+
+def process_urls_and_download(j_types=("acs", "aps"), max_workers: int = 5):
+    """
+    Resolve and download, concurrently and through one shared engine, every link of the given publishers
+    in the manifest that has not been downloaded yet, including links left over from interrupted runs.
+    Each publisher's PDFs go to its own download directory.
+    """
+    manifest = get_manifest()
+    records = [record for j_type in j_types for record in manifest.query(j_type)]
+    seen_dois = set()  # Shared across publishers, so a paper in several feeds is downloaded once
+    for j_type in j_types:
+        os.makedirs(download_directory(j_type), exist_ok=True)
+
+    with create_engine(pool_size=max_workers) as engine:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(download_link, record, download_directory(record["j_type"]), engine, seen_dois): record
+                for record in records
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error downloading {futures[future]['raw_url']}: {e}")
+
+
+if __name__ == "__main__":
+    process_urls_and_download()
@@ -0,0 +1,152 @@
+import base64
+from email.utils import parsedate_to_datetime
+
+from util import metrics
+from util.links import extract_links
+from util.manifest import get_manifest
+from util.publishers import PUBLISHERS
+from util.gmail import (
+    get_service,
+    save_refreshed_token,
+    list_message_ids,
+    list_new_message_ids,
+    iter_messages,
+    save_history_checkpoint,
+)
+
+
+def history_checkpoint(j_type: str) -> str:
+    """
+    File holding the Gmail historyId up to which the alerts of a publisher have been read.
+    """
+    return f"./data/{j_type}_gmail_history.json"
+
+
+def _extract_parts(payload):
+    """
+    Recursively traverse the payload to find all parts that contain 'data'.
+    Yields tuples of (mime_type, base64url_encoded_data).
+    """
+    if "parts" in payload:
+        for part in payload["parts"]:
+            yield from _extract_parts(part)
+    else:
+        body_data = payload.get("body", {}).get("data")
+        mime_type = payload.get("mimeType", "")
+        if body_data:
+            yield (mime_type, body_data)
+
+
+def _decode_base64url(encoded_str):
+    """
+    Decode a Base64URL-encoded string (as used by Gmail) into a UTF-8 string.
+    """
+    encoded_str = encoded_str.replace("-", "+").replace("_", "/")
+    decoded_bytes = base64.urlsafe_b64decode(encoded_str)
+    return decoded_bytes.decode("utf-8")
+
+
+def _extract_message_body(payload):
+    """
+    Extract the first HTML or plain-text body found in the message payload.
+    If both exist, prefer the HTML body.
+    Returns a string (the email content) or None if not found.
+    """
+    text_body = None
+    html_body = None
+
+    for mime_type, data_str in _extract_parts(payload):
+        decoded_content = _decode_base64url(data_str)
+        if mime_type == "text/plain" and text_body is None:
+            text_body = decoded_content
+        elif mime_type == "text/html" and html_body is None:
+            html_body = decoded_content
+
+    return html_body if html_body else text_body
+
+
+def iter_emails(j_types=("acs", "aps"), max_num=6, incremental=False):
+    """
+    Connect to the Gmail API once, query the unread alert emails of every publisher in j_types,
+    extract subject, timestamp, and article links from each email body, and yield them as
+    (j_type, message_id, subject, timestamp, links) one email at a time.
+
+    With incremental=True, only messages added since the historyId stored in the publisher's
+    history_checkpoint are fetched.
+    """
+    service = get_service()
+    print("✅ Connected to Gmail API!")
+    for j_type in j_types:
+        for message_id, subject, timestamp, links in _iter_publisher_emails(service, j_type, max_num, incremental):
+            yield j_type, message_id, subject, timestamp, links
+    save_refreshed_token()
+
+
+def _iter_publisher_emails(service, j_type, max_num, incremental):
+    sender = PUBLISHERS[j_type]["sender"]
+    marker = PUBLISHERS[j_type]["links"].get("after_marker")
+    checkpoint = history_checkpoint(j_type)
+
+    query = f"is:unread from:{sender}"
+    history_id = None
+    with metrics.timer("gmail_list"):
+        if incremental:
+            message_ids, history_id = list_new_message_ids(service, query, sender, checkpoint, max_num=max_num)
+        else:
+            message_ids = list_message_ids(service, query, max_num=max_num)
+    print("✅ Fetched message IDs from Gmail!")
+
+    if not message_ids:
+        print("❌ No new emails found.")
+        if history_id:
+            save_history_checkpoint(checkpoint, history_id)
+        return
+
+    print(f"📩 Found {len(message_ids)} emails from {sender}:")
+
+    failed = []  # Messages that could not be fetched; the checkpoint must not move past them
+    for msg_data in iter_messages(service, message_ids, failed=failed):
+        headers = msg_data["payload"]["headers"]
+
+        subject = next((h["value"] for h in headers if h["name"] == "Subject"), "No Subject")
+        date_header = next((h["value"] for h in headers if h["name"] == "Date"), None)
+
+        if date_header:
+            timestamp = parsedate_to_datetime(date_header)
+        else:
+            timestamp = "Unknown Time"
+
+        body = _extract_message_body(msg_data["payload"])
+        filtered_links = []
+
+        if body:
+            filtered_links = extract_links(body, j_type)
+            if filtered_links is None:
+                print(f"⚠️ '{marker}' marker not found in the email body.")
+                filtered_links = []
+
+        metrics.count("emails")
+        metrics.count("links", len(filtered_links))
+        yield msg_data["id"], subject, timestamp, filtered_links
+
+    if failed:
+        print(f"⚠️ {len(failed)} emails from {sender} could not be fetched, they are read again next run.")
+    elif history_id:
+        save_history_checkpoint(checkpoint, history_id)
+
+
+@metrics.timed("check_gmail")
+def check_gmail(j_types=("acs", "aps"), max_num=6, incremental=False):
+    """
+    Record the links of every new alert email of the given publishers in the link manifest, one record per link.
+    """
+    manifest = get_manifest()
+    for j_type, message_id, subject, timestamp, links in iter_emails(j_types, max_num, incremental):
+        if not links:
+            print(f"❌ No matching links found in '{subject}'.")
+        manifest.add_email(j_type, message_id, subject, timestamp, links)
+    manifest.flush()
+
+
+if __name__ == "__main__":
+    check_gmail()
@@ -1,168 +1,529 @@
 import os
-import shutil
-import requests
 import json
 import time
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 
-from util.pdftext import extract_section
+from util import metrics
+from util.pdftext import extract_section_cached
+from util.paper_index import get_index, file_sha256
+from util.manifest import get_manifest, TERMINAL
+from util.summary_cache import get_cache, cache_key
+from util.usage_ledger import get_ledger
+from util.request_builder import RequestBuilder
+from util.siliconflow_client import AsyncSiliconFlowClient, API_URL, estimate_tokens
+from util.chunking import split_into_chunks, truncate_to_budget
+from util.summary_writer import SummaryWriter
 
 
 DEBUGGING = False
 
 
-def _summarize_pdf_text(pdf_text, api_key, model="Pro/deepseek-ai/DeepSeek-V3"):
+PROMPT = (
+    "你是一位专业的文章摘要生成器，你的任务是分析提供的文本，并用中文生成结构清晰、准确且简明的摘要。"
+    "请确保摘要能够准确捕捉文章的要点、论点和结论，着重介绍论文本身的工作内容和价值，避免冗余信息或遗漏重要内容，严禁直接翻译抄袭文章中Abstract中的内容！"
+    "摘要应易于理解，并且长度应合理，不应过长或过短，约在500字左右，严格控制不得超过800字！"
+    "在开头应指出文章的几个关键词."
+)
+
+MAP_PROMPT = (
+    "你将收到一篇论文的其中一部分。请用中文简要概括这一部分的主要内容、方法和结果，保留关键数据和结论，"
+    "不要添加原文中没有的信息，长度不超过300字。"
+)
+
+REDUCE_PREFIX = "以下是同一篇论文各部分的分段摘要，请据此生成整篇论文的摘要：\n\n"
+
+# Input token budget per journal type. Papers over max_input_tokens are either truncated or split into
+# section-aware chunks of chunk_tokens that are summarized separately (map) and then merged (reduce).
+TOKEN_BUDGETS = {
+    "acs": {"max_input_tokens": 24000, "chunk_tokens": 8000, "strategy": "map_reduce"},
+    "aps": {"max_input_tokens": 16000, "chunk_tokens": 6000, "strategy": "map_reduce"},
+}
+DEFAULT_BUDGET = {"max_input_tokens": 24000, "chunk_tokens": 8000, "strategy": "truncate"}
+
+# Holds the system prompts (overridable per journal in config/prompts/) and static parameters for the run.
+REQUESTS = RequestBuilder({"summary": PROMPT, "map": MAP_PROMPT})
+
+
+async def _request(
+    payload: dict,
+    client: AsyncSiliconFlowClient,
+    partial_path: str = None,
+    j_type: str = None,
+    paper: str = None,
+    kind: str = "summary",
+):
+    """
+    Send one payload, answering from the on-disk cache when possible, optionally streaming into partial_path.
+    The token usage, latency and cost of every request sent are recorded in the usage ledger under
+    j_type, paper and kind.
+
+    Returns:
+        tuple: (response, content): the raw response and its summary text, or None as content if the
+        response is not a valid completion. The response is parsed once, here.
+    """
+    cache = get_cache()
+    key = cache_key(payload)
+    cached = cache.get(key)
+    if cached is not None:
+        metrics.count("summary_cache_hits")
+        return cached, _parse_response(cached)[0]
+
+    start = time.perf_counter()
+    with metrics.timer("api_request"):
+        if partial_path:
+            os.makedirs(os.path.dirname(partial_path), exist_ok=True)
+            with open(partial_path, "w", encoding="utf-8") as partial:
+
+                def _on_delta(delta):
+                    partial.write(delta)
+                    partial.flush()
+
+                def _on_retry():
+                    partial.seek(0)
+                    partial.truncate()
+
+                response = await client.chat_stream(payload, on_delta=_on_delta, on_retry=_on_retry)
+        else:
+            response = await client.chat(payload)
+    latency = time.perf_counter() - start
+
+    content, usage = _parse_response(response)
+    get_ledger().record(usage, payload["model"], latency, j_type=j_type, paper=paper, kind=kind)
+    if content is not None:
+        cache.set(key, response)
+    return response, content
+
+
+@metrics.timed("summarize_pdf_text")
+async def _summarize_pdf_text(
+    pdf_text,
+    client: AsyncSiliconFlowClient,
+    model="Pro/deepseek-ai/DeepSeek-V3",
+    partial_path: str = None,
+    j_type: str = "acs",
+    paper: str = None,
+):
     """
     Sends the extracted PDF text to the SiliconFlow API for summarization.
 
+    Texts within the token budget of the journal type (TOKEN_BUDGETS) are sent in one request. Longer
+    texts are truncated, or split into section-aware chunks that are summarized in parallel and then
+    merged into one summary, depending on the budget's strategy.
+
     Parameters:
       pdf_text (str): The text extracted from the PDF.
-      api_key (str): Your SiliconFlow API key.
+      client (AsyncSiliconFlowClient): Shared client holding the connection pool and rate limits.
+      partial_path (str): If given, the response is streamed and the summary is written to this file
+        token by token as it is generated.
+      j_type (str): Journal type selecting the token budget.
+      paper (str): DOI or file name the requests are recorded under in the usage ledger.
 
     Returns:
-      The summary  returned by the API.
+      (response, content): The response returned by the API and its summary text, or None as content
+      if it is not a valid completion. Successful responses are cached on disk, keyed on the model,
+      prompt, text and sampling parameters, so re-sending the same request costs no tokens.
     """
-    prompt = (
-        "你是一位专业的文章摘要生成器，你的任务是分析提供的文本，并用中文生成结构清晰、准确且简明的摘要。"
-        "请确保摘要能够准确捕捉文章的要点、论点和结论，着重介绍论文本身的工作内容和价值，避免冗余信息或遗漏重要内容，严禁直接翻译抄袭文章中Abstract中的内容！"
-        "摘要应易于理解，并且长度应合理，不应过长或过短，约在500字左右，严格控制不得超过800字！"
-        "在开头应指出文章的几个关键词."
-    )
+    budget = TOKEN_BUDGETS.get(j_type, DEFAULT_BUDGET)
+
+    if estimate_tokens(pdf_text) > budget["max_input_tokens"]:
+        if budget["strategy"] == "map_reduce":
+            chunks = split_into_chunks(pdf_text, budget["chunk_tokens"])
+            print(f"📚 Text over budget, summarizing it in {len(chunks)} chunks.")
+            responses = await asyncio.gather(
+                *(
+                    _request(
+                        REQUESTS.build(chunk, model, j_type=j_type, kind="map", max_tokens=1024),
+                        client,
+                        j_type=j_type,
+                        paper=paper,
+                        kind="map",
+                    )
+                    for chunk in chunks
+                )
+            )
+            for response, content in responses:
+                if content is None:
+                    return response, None
+            pdf_text = REDUCE_PREFIX + "\n\n".join(content for _, content in responses)
+        else:
+            pdf_text = truncate_to_budget(pdf_text, budget["max_input_tokens"])
 
-    url = "https://api.siliconflow.cn/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-
-    payload = {
-        "model": f"{model}",
-        "messages": [
-            {
-                "role": "system",
-                "content": prompt,
-            },
-            {"role": "user", "content": pdf_text},
-        ],
-        "stream": False,
-        "max_tokens": 2048,
-        "stop": ["null"],
-        "temperature": 0.3,
-        "top_p": 0.7,
-        "top_k": 50,
-        "frequency_penalty": 0.5,
-        "n": 1,
-        "response_format": {"type": "text"},
-    }
-
-    response = requests.post(url, json=payload, headers=headers)
-    response = response.text
-    return response
-
-
-def _write_summary_to_file(pdf_name: str, summary, output_dir: str, output_name: str):
-    summary_json = json.loads(summary)
-    summary_filename = os.path.join(output_dir, output_name)
-    with open(summary_filename, "a", encoding="utf-8") as summary_file:
-        summary_file.write(f"Summary of {pdf_name}\n\n")
-        try:
-            summary_file.write(summary_json["choices"][0]["message"]["content"])
-        except:
-            summary_file.write(summary)
-        summary_file.write("\n\n")
-        summary_file.write("#" + "-" * 120 + "#\n")
+    return await _request(
+        REQUESTS.build(pdf_text, model, j_type=j_type), client, partial_path=partial_path, j_type=j_type, paper=paper
+    )
 
 
-def _check_summary(summary):
+def _parse_response(response):
+    """
+    Parse a response: (summary text, usage), with None as the text if it is not a valid completion.
+    A completion whose message cannot be found is kept whole.
+    """
     try:
-        summary_json = json.loads(summary)
-        if "choices" in summary_json:
-            return True
-        else:
-            return False
-    except:
-        return False
+        response_json = json.loads(response)
+    except (TypeError, ValueError):
+        return None, None
+    if not isinstance(response_json, dict):
+        return None, None
+    usage = response_json.get("usage")
+    if "choices" not in response_json:
+        return None, usage
+    try:
+        return response_json["choices"][0]["message"]["content"], usage
+    except (KeyError, IndexError, TypeError):
+        return response, usage
 
 
-def _process_single_pdf(
-    pdf_path: str,
-    filename: str,
+def finish_summarized_jobs(j_type: str, processed_dir: str, output_dir: str, output_name: str, writer: SummaryWriter):
+    """
+    Hand the writer the jobs that were summarized but not written when an earlier run stopped.
+    """
+    for job in get_manifest().query(j_type, statuses=("summarized",), due_only=False):
+        writer.add(job, job["summary"], processed_dir, output_dir, output_name)
+
+
+async def _process_single_pdf(
+    pdf_text: str,
+    job: dict,
     processed_dir: str,
-    api_key: str,
+    client: AsyncSiliconFlowClient,
+    writer: SummaryWriter,
     output_dir: str,
     output_name: str,
-    file_lock: threading.Lock,
     cool_down: int = 0,
     j_type="acs",
+    file_hash: str = None,
+    stream: bool = False,
 ):
     """
     Parameters:
-        pdf_path (str): Full path to the PDF file.
-        filename (str): Name of the PDF file.
-        api_key (str): API key for the summarization service.
+        pdf_text (str): Text extracted from the PDF.
+        job (dict): Manifest record of the paper, in state "extracted".
         processed_dir (str): Directory where the processed pdfs are moved to.
+        client (AsyncSiliconFlowClient): Client for the summarization service.
+        writer (SummaryWriter): Writer task the finished summary is handed to.
         output_dir (str): Directory where the summary file is saved.
         output_name (str): Name of the output summary file.
-        file_lock (threading.Lock): Lock to ensure thread-safe file operations.
         cool_down (0): Seconds to wait after processing.
+        file_hash (str): SHA-256 of the PDF, used to record it as summarized in the paper index.
+        stream (bool): Stream the summary into output_dir/.partial/<filename>.txt while it is generated.
     """
+    manifest = get_manifest()
+    filename = os.path.basename(job["path"])
 
-    pdf_text = extract_section(pdf_path, j_type)
-
-    if DEBUGGING:
-        with file_lock:
-            with open("content.txt", "w", encoding="utf-8") as f:
-                f.write(pdf_text)
-
-    summary = _summarize_pdf_text(pdf_text, api_key, model="Pro/deepseek-ai/DeepSeek-V3")
-
-    if not os.path.exists(processed_dir):
-        os.mkdir(processed_dir)
-
-    if _check_summary(summary):
-        with file_lock:
-            _write_summary_to_file(filename, summary, output_dir=output_dir, output_name=output_name)
-        print(f"[{time.ctime().split()[3]}] Summary for {filename} written to file.")
-        print("-" * 120)
-        shutil.move(pdf_path, processed_dir)
+    if DEBUGGING and pdf_text:
+        with open("content.txt", "w", encoding="utf-8") as f:
+            f.write(pdf_text)
 
-    else:
+    partial_path = os.path.join(output_dir, ".partial", f"{filename}.txt") if stream else None
+    try:
+        summary, content = await _summarize_pdf_text(
+            pdf_text,
+            client,
+            model="Pro/deepseek-ai/DeepSeek-V3",
+            partial_path=partial_path,
+            j_type=j_type,
+            paper=job["doi"] or filename,
+        )
+    finally:
+        # Only a preview while generating: the finished summary goes to the manifest, a failed one is redone.
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
+    if content is None:
         print(f"FAILED to write summary for {filename} to file.")
         print("Original output as follows:")
         print(summary)
         print("-" * 120)
+        manifest.fail(job["id"], "invalid summary response")
+        return
+    # The summary is stored before it is written, so a crash from here on never costs another request.
+    if not manifest.transition(job["id"], "extracted", "summarized", summary=content):
+        print(f"⏭️ {filename} is no longer extracted, another worker has taken it over.")
+        return
+    job = {**job, "status": "summarized", "summary": content}
 
-    time.sleep(cool_down)
+    await writer.put(job, job["summary"], processed_dir, output_dir, output_name, file_hash)
 
+    await asyncio.sleep(cool_down)
 
-def process_pdfs_in_directory(
-    pdf_dir: str, processed_dir: str, api_key: str, output_dir: str, output_name: str = "summary.txt", j_type="acs"
+
+def _skip_if_summarized(index, pdf_path, file_hash):
+    """
+    Remove the PDF and return True if identical content has already been summarized.
+    """
+    stage, known_path = index.lookup(file_hash)
+    if stage == "summarized" and os.path.exists(known_path):
+        print(f"⏭️ {os.path.basename(pdf_path)} was already summarized as {known_path}, skipping.")
+        os.remove(pdf_path)
+        return True
+    return False
+
+
+def _claim_job(index, pdf_path, j_type):
+    """
+    Look up the job of a downloaded PDF and decide whether it still has work to do. Summarized jobs
+    are left to finish_summarized_jobs, which hands them to the writer.
+
+    Returns:
+        tuple: (job, file_hash), or None if the job is summarized, done, failed for good or still backing off.
+    """
+    manifest = get_manifest()
+    job = manifest.job_for_pdf(j_type, pdf_path)
+    if job["status"] in TERMINAL or job["status"] == "summarized":
+        print(f"⏭️ {os.path.basename(pdf_path)} is {job['status']}, skipping.")
+        return None
+    if job["next_attempt"] > time.time():
+        print(
+            f"⏳ {os.path.basename(pdf_path)} failed {job['retries']} time(s), retrying after {time.ctime(job['next_attempt'])}."
+        )
+        return None
+
+    file_hash = file_sha256(pdf_path)
+    if _skip_if_summarized(index, pdf_path, file_hash):
+        if not manifest.transition(job["id"], job["status"], "skipped"):
+            print(f"⏭️ {os.path.basename(pdf_path)} is no longer {job['status']}, another worker has taken it over.")
+        return None
+    return job, file_hash
+
+
+def _cap_reached(job):
+    """
+    True if the usage cap of the run has been reached; the job is left in its current state for a later run.
+    """
+    if not get_ledger().cap_reached():
+        return False
+    print(f"💰 Usage cap reached, leaving {os.path.basename(job['path'])} for a later run.")
+    return True
+
+
+async def _extract_job(pool, job, j_type, file_hash):
+    """
+    Extract the text of a job's PDF in the process pool and move the job to "extracted".
+    Returns None if extraction failed, or for a job that is already summarized, which finish_summarized_jobs
+    hands to the writer.
+    """
+    if job["status"] == "summarized":
+        return None
+    try:
+        # Collects the extraction timings recorded in the worker process as well.
+        pdf_text = await metrics.run_in_executor(pool, extract_section_cached, job["path"], j_type, file_hash)
+    except Exception as e:
+        print(f"An error occurred while extracting {os.path.basename(job['path'])}: {e!r}")
+        get_manifest().fail(job["id"], repr(e))
+        return None
+    if job["status"] == "downloaded":
+        if not get_manifest().transition(job["id"], "downloaded", "extracted"):
+            print(f"⏭️ {os.path.basename(job['path'])} is no longer downloaded, another worker has taken it over.")
+            return None
+        job = {**job, "status": "extracted"}
+    return job, pdf_text
+
+
+async def summarize_pdf(
+    pdf_path: str,
+    client: AsyncSiliconFlowClient,
+    pool: ProcessPoolExecutor,
+    writer: SummaryWriter,
+    processed_dir: str,
+    output_dir: str,
+    output_name: str,
+    j_type="acs",
+    stream: bool = False,
 ):
-    file_lock = threading.Lock()
-
-    pdf_files = [filename for filename in os.listdir(pdf_dir) if filename.lower().endswith(".pdf")]
-
-    with ThreadPoolExecutor(max_workers=16) as executor:
-        futures = []
-        for filename in pdf_files:
-            pdf_path = os.path.join(pdf_dir, filename)
-            futures.append(
-                executor.submit(
-                    _process_single_pdf,
-                    pdf_path,
-                    filename,
-                    processed_dir,
-                    api_key,
-                    output_dir,
-                    output_name,
-                    file_lock,
-                    j_type=j_type,
-                )
+    """
+    Summarize a single PDF as soon as it is available: skip it if its job is done or already summarized,
+    extract its text in the given process pool, then summarize it and hand it to the writer.
+    Used by the streaming pipeline.
+    """
+    claimed = await asyncio.to_thread(_claim_job, get_index(), pdf_path, j_type)
+    if claimed is None:
+        return
+    job, file_hash = claimed
+    if _cap_reached(job):
+        return
+    extracted = await _extract_job(pool, job, j_type, file_hash)
+    if extracted is None:
+        return
+    job, pdf_text = extracted
+    try:
+        await _process_single_pdf(
+            pdf_text,
+            job,
+            processed_dir,
+            client,
+            writer,
+            output_dir,
+            output_name,
+            j_type=j_type,
+            file_hash=file_hash,
+            stream=stream,
+        )
+    except Exception as e:
+        get_manifest().fail(job["id"], repr(e))
+        raise
+
+
+async def _extract_into_queue(pool, slots, queue, job, j_type, file_hash):
+    """
+    Extract one PDF in the process pool and hand its text to the summarization workers.
+    The extraction slot is held until the queue accepts the text, so a full queue pauses extraction.
+    """
+    async with slots:
+        if _cap_reached(job):
+            return
+        extracted = await _extract_job(pool, job, j_type, file_hash)
+        if extracted is not None:
+            await queue.put(extracted)
+
+
+async def _summarize_from_queue(
+    queue, file_hashes, processed_dir, client, writer, output_dir, output_name, j_type, stream
+):
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        job, pdf_text = item
+        if _cap_reached(job):
+            continue
+        try:
+            await _process_single_pdf(
+                pdf_text,
+                job,
+                processed_dir,
+                client,
+                writer,
+                output_dir,
+                output_name,
+                j_type=j_type,
+                file_hash=file_hashes[job["id"]],
+                stream=stream,
             )
+        except Exception as e:
+            print(f"An error occurred while processing a PDF: {e!r}")
+            get_manifest().fail(job["id"], repr(e))
+
+
+async def _process_pdfs(
+    pdf_dir: str,
+    processed_dir: str,
+    api_key: str,
+    output_dir: str,
+    output_name: str,
+    j_type: str,
+    api_url: str,
+    max_concurrency: int,
+    stream: bool,
+    extract_workers: int,
+    digest: bool,
+):
+    """
+    Two-stage pipeline: a process pool extracts the PDF texts (CPU-bound) and feeds a bounded queue
+    that max_concurrency asyncio workers drain to call the API (I/O-bound). Each stage is sized on its own.
+    Finished summaries go to a single SummaryWriter task.
+    """
+    index = get_index()
+    index.index_directory(processed_dir, "summarized")
+    writer = SummaryWriter(digest_dir=output_dir if digest else None).start()
+    try:
+        finish_summarized_jobs(j_type, processed_dir, output_dir, output_name, writer)
 
-        for future in as_completed(futures):
+        jobs = []
+        file_hashes = {}
+        for filename in os.listdir(pdf_dir):
+            if not filename.lower().endswith(".pdf"):
+                continue
             try:
-                future.result()
-            except:
-                print(f"An error occurred while processing a PDF")
+                claimed = _claim_job(index, os.path.join(pdf_dir, filename), j_type)
+            except Exception as e:
+                print(f"An error occurred while looking up {filename}: {e!r}")
+                continue
+            if claimed is not None:
+                job, file_hashes[job["id"]] = claimed
+                jobs.append(job)
+
+        if not jobs:
+            return
+
+        extract_workers = extract_workers or os.cpu_count() or 1
+        queue = asyncio.Queue(maxsize=max_concurrency)
+        slots = asyncio.Semaphore(extract_workers)
+
+        async with AsyncSiliconFlowClient(api_key, url=api_url, max_connections=max_concurrency) as client:
+            with ProcessPoolExecutor(max_workers=min(extract_workers, len(jobs))) as pool:
+                workers = [
+                    asyncio.create_task(
+                        _summarize_from_queue(
+                            queue, file_hashes, processed_dir, client, writer, output_dir, output_name, j_type, stream
+                        )
+                    )
+                    for _ in range(max_concurrency)
+                ]
+                await asyncio.gather(
+                    *(_extract_into_queue(pool, slots, queue, job, j_type, file_hashes[job["id"]]) for job in jobs)
+                )
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+    finally:
+        await writer.close()
+
+
+def process_pdfs_in_directory(
+    pdf_dir: str,
+    processed_dir: str,
+    api_key: str,
+    output_dir: str,
+    output_name: str = "summary.txt",
+    j_type="acs",
+    api_url: str = API_URL,
+    max_concurrency: int = 16,
+    stream: bool = False,
+    extract_workers: int = None,
+    digest: bool = False,
+    max_tokens: int = None,
+    max_cost: float = None,
+):
+    """
+    Summarize every PDF in pdf_dir, extracting the texts in a process pool and summarizing them
+    concurrently on an asyncio event loop. Summaries are appended to output_dir/output_name and
+    each summarized PDF is moved to processed_dir.
+
+    Progress is tracked per paper in the link manifest, so only unfinished papers are processed:
+    papers that are done, failed for good or still backing off after a failure are skipped, and
+    papers summarized before a crash are written without calling the API again.
+
+    Parameters:
+        api_url (str): Chat-completions endpoint, e.g. a local mock server for offline testing.
+        max_concurrency (int): Maximum number of requests in flight.
+        stream (bool): Stream each summary into its own file under output_dir/.partial/ as it is
+            generated, and append it to output_name once complete.
+        extract_workers (int): Processes used for text extraction. Defaults to the number of cores.
+        digest (bool): Also write a Markdown and JSONL digest of the run, sorted by journal and DOI,
+            into output_dir.
+        max_tokens (int): Stop dispatching new papers once the API requests of this run used this many
+            prompt plus completion tokens (see util.usage_ledger). None means no cap.
+        max_cost (float): Same, for the cost in yuan.
+    """
+    ledger = get_ledger()
+    ledger.set_cap(max_tokens, max_cost)
+    asyncio.run(
+        _process_pdfs(
+            pdf_dir,
+            processed_dir,
+            api_key,
+            output_dir,
+            output_name,
+            j_type,
+            api_url,
+            max_concurrency,
+            stream,
+            extract_workers,
+            digest,
+        )
+    )
+    ledger.report_run()
 
 
 def main():
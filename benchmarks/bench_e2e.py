@@ -0,0 +1,246 @@
+"""
+Offline end-to-end benchmark of main.py: the full ACS + APS run (Gmail -> redirects -> downloads ->
+extraction -> summaries) against local stand-ins for Gmail, the publishers and the SiliconFlow API
+(see benchmarks/fake_services.py), in a fresh working directory.
+
+Usage:
+    python -m benchmarks.bench_e2e [--emails N] [--links N] [--api-latency S] [--rate-429 P] [--phased]
+                                   [--report PATH] [--baseline PATH] [--tolerance F]
+
+Reports papers per minute, p50/p95 per-paper latency (from the moment a link is recorded until its
+summary arrives), peak RSS, and the stage timings of main.py --metrics. With --baseline, the run is
+compared with an earlier --report and the exit status is 1 if throughput or p95 latency got worse by
+more than --tolerance.
+
+main.py runs in a child process (so its peak RSS is measured on its own) with the Gmail service
+replaced by FakeGmailService and the ACS PDF URLs pointed at the local server. Downloads take the
+direct HTTP path; the Chrome fallback is not exercised.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGES_FILE = "bench_messages.json"
+CONFIG_FILE = "bench_config.json"
+METRICS_FILE = "bench_metrics.json"
+LOG_FILE = "bench_run.log"
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _run_child(workdir, main_argv):
+    """
+    Entry point of the child process: install the fake Gmail service and run main.py with main_argv.
+    """
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    with open(MESSAGES_FILE, "r", encoding="utf-8") as f:
+        messages = json.load(f)
+
+    import main
+    import GmailExtractor
+    from util.publishers import PUBLISHERS
+    from benchmarks.fake_services import FakeGmailService
+
+    service = FakeGmailService(messages, latency=config["gmail_latency"])
+    GmailExtractor.get_service = lambda: service
+    GmailExtractor.save_refreshed_token = lambda: None
+
+    acs_pdf_url = PUBLISHERS["acs"]["pdf_url"]
+    publisher_url = config["publisher_url"]
+    PUBLISHERS["acs"]["pdf_url"] = lambda url: acs_pdf_url(url).replace("https://pubs.acs.org", publisher_url)
+
+    main.main(main_argv)
+
+
+def _paper_latencies(workdir):
+    """
+    Status counts of the manifest, and the seconds from recording to summarizing of every written paper.
+    The summarized time is stamped per paper, whereas "updated" of a written record is the writer checkpoint
+    that flushed it.
+    """
+    from util.sqlite_store import DB_PATH
+
+    conn = sqlite3.connect(os.path.join(workdir, DB_PATH))
+    try:
+        statuses = dict(conn.execute("SELECT status, COUNT(*) FROM links GROUP BY status").fetchall())
+        latencies = [
+            row[0]
+            for row in conn.execute(
+                "SELECT summarized - created FROM links "
+                "WHERE status = 'written' AND created IS NOT NULL AND summarized IS NOT NULL"
+            )
+        ]
+    finally:
+        conn.close()
+    return statuses, latencies
+
+
+def _compare(report, baseline, tolerance):
+    """
+    Print the change against a baseline report and return False on a regression beyond tolerance.
+    """
+    ok = True
+    checks = [("papers_per_minute", 1), ("p95_latency_seconds", -1)]  # +1: higher is better
+    for key, direction in checks:
+        old, new = baseline.get(key), report.get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change * direction > tolerance
+        ok = ok and not worse
+        print(f"  {key}: {old:.2f} -> {new:.2f} ({change:+.1%}){'  ❌ regression' if worse else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=5, help="alert emails per publisher")
+    parser.add_argument("--links", type=int, default=4, help="article links per email")
+    parser.add_argument("--pages", type=int, default=6, help="pages of each generated paper")
+    parser.add_argument("--pdf", help="sample PDF to stamp for every paper instead of generated ones")
+    parser.add_argument("--api-latency", type=float, default=2.0, help="mean seconds per chat completion")
+    parser.add_argument("--api-jitter", type=float, default=0.5, help="uniform +/- seconds around the mean")
+    parser.add_argument("--prefill", type=float, default=0.05, help="seconds per 1000 uncached prompt tokens")
+    parser.add_argument("--rate-429", type=float, default=0.05, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After of the 429 responses")
+    parser.add_argument("--gmail-latency", type=float, default=0.1, help="seconds per Gmail request or batch")
+    parser.add_argument("--publisher-latency", type=float, default=0.1, help="seconds per publisher request")
+    parser.add_argument("--phased", action="store_true", help="run the stages one after another")
+    parser.add_argument("--stream", action="store_true", help="stream the summaries")
+    parser.add_argument("--workdir", help="working directory of the run (default: a temporary one)")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary working directory")
+    parser.add_argument("--report", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args, main_argv = parser.parse_known_args()
+
+    if args.child:
+        _run_child(args.child, [a for a in main_argv if a != "--"])
+        return
+
+    from benchmarks.fake_services import PublisherServer, ChatServer, alert_messages, make_paper
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="bench_e2e-"))
+    os.makedirs(os.path.join(workdir, "config"), exist_ok=True)
+    with open(os.path.join(workdir, "config", "api.txt"), "w") as f:
+        f.write("bench-key\n")
+
+    papers = {}
+    publishers = PublisherServer(papers, latency=args.publisher_latency).start()
+    chat = ChatServer(args.api_latency, args.api_jitter, args.rate_429, args.retry_after, args.prefill).start()
+
+    messages = []
+    start = time.perf_counter()
+    for j_type in ("acs", "aps"):
+        j_messages, article_ids = alert_messages(j_type, publishers.base_url, args.emails, args.links)
+        messages += j_messages
+        for article_id in article_ids:
+            papers[article_id] = make_paper(j_type, article_id, pages=args.pages, sample=args.pdf)
+    print(f"📄 Generated {len(messages)} alert emails and {len(papers)} papers in {time.perf_counter() - start:.1f}s.")
+
+    with open(os.path.join(workdir, MESSAGES_FILE), "w", encoding="utf-8") as f:
+        json.dump(messages, f)
+    with open(os.path.join(workdir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({"gmail_latency": args.gmail_latency, "publisher_url": publishers.base_url}, f)
+
+    main_argv = ["run", "-j", "acs", "-j", "aps", "--max-num", str(args.emails), "--metrics", METRICS_FILE]
+    main_argv += ["--phased"] * args.phased + ["--stream"] * args.stream
+    env = dict(
+        os.environ,
+        PYTHONPATH=REPO_DIR,
+        SILICONFLOW_API_URL=chat.url,
+        PYTHONIOENCODING="utf-8",
+    )
+    command = [sys.executable, "-m", "benchmarks.bench_e2e", "--child", workdir, "--", *main_argv]
+
+    print(f"🚀 Running main.py {' '.join(main_argv)} in {workdir}")
+    start = time.perf_counter()
+    with open(os.path.join(workdir, LOG_FILE), "w", encoding="utf-8") as log:
+        returncode = subprocess.call(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    wall = time.perf_counter() - start
+    publishers.shutdown()
+    chat.shutdown()
+
+    if returncode != 0:
+        print(f"❌ main.py exited with status {returncode}, see {os.path.join(workdir, LOG_FILE)}")
+        sys.exit(returncode)
+
+    statuses, latencies = _paper_latencies(workdir)
+    peak_rss_mb = None
+    if resource is not None:
+        # Largest process of the run (main.py or one of its extraction workers); kilobytes on Linux.
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    with open(os.path.join(workdir, METRICS_FILE), "r", encoding="utf-8") as f:
+        stage_metrics = json.load(f)
+
+    report = {
+        "papers": len(papers),
+        "written": len(latencies),
+        "statuses": statuses,
+        "wall_seconds": wall,
+        "papers_per_minute": len(latencies) / wall * 60,
+        "p50_latency_seconds": _percentile(latencies, 0.50),
+        "p95_latency_seconds": _percentile(latencies, 0.95),
+        "peak_rss_mb": peak_rss_mb,
+        "api_requests": chat.counts,
+        "pdf_requests": publishers.counts.get("pdf", 0),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("child", "report", "baseline")},
+        "stages": stage_metrics,
+    }
+
+    print(f"✅ {report['written']}/{report['papers']} papers written in {wall:.1f}s")
+    print(f"  throughput : {report['papers_per_minute']:.1f} papers/min")
+    if latencies:
+        print(f"  latency    : p50 {report['p50_latency_seconds']:.2f}s, p95 {report['p95_latency_seconds']:.2f}s")
+    if peak_rss_mb is not None:
+        print(f"  peak RSS   : {peak_rss_mb:.0f} MB")
+    print(f"  API        : {chat.counts.get('ok', 0)} completions, {chat.counts.get('429', 0)} rate limited")
+    counters = stage_metrics["counters"]
+    if counters.get("tokens_in"):
+        cached = counters.get("tokens_cached", 0)
+        print(f"  tokens     : {counters['tokens_in']} prompt ({cached / counters['tokens_in']:.0%} cached)")
+    for name, timer in stage_metrics["timers"].items():
+        print(f"  {name:<19}: {timer['count']:>4} x, p50 {timer['p50_seconds']:.3f}s, p95 {timer['p95_seconds']:.3f}s")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📊 Report written to {args.report}")
+
+    ok = True
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline}:")
+        ok = _compare(report, baseline, args.tolerance)
+
+    if not args.workdir and not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark of the link-extraction backends in util.links against the previous implementation
+(a full BeautifulSoup html.parser tree per email), checking that every backend returns the same links.
+
+Usage:
+    python -m benchmarks.bench_links [corpus_dir] [--type acs|aps] [--repeat N] [--synthetic N]
+
+corpus_dir holds saved alert email bodies as .html files and defaults to data/email_corpus/<type>.
+With --synthetic N, N alert-like emails are generated instead.
+"""
+
+import os
+import re
+import time
+import random
+import argparse
+import functools
+import statistics
+
+from bs4 import BeautifulSoup
+
+from util.links import BACKENDS, extract_links
+
+
+def _legacy_acs_links(body):
+    soup = BeautifulSoup(body, "html.parser")
+    return [a["href"] for a in soup.find_all("a", href=True) if re.search(r"\bRead Article\b", a.get_text(), re.I)]
+
+
+def _legacy_aps_links(body):
+    soup = BeautifulSoup(body, "html.parser")
+    letters_elements = soup.find_all(string=re.compile("LETTERS"))
+    if not letters_elements:
+        return None
+    marker = letters_elements[-1].parent
+    return [a["href"] for a in marker.find_all_next("a", href=True) if "m-email-utm-campaign-prl-alert" in a["href"]]
+
+
+LEGACY = {"acs": _legacy_acs_links, "aps": _legacy_aps_links}
+
+
+def _synthetic_email(j_type, rng, articles=40):
+    """
+    Table-heavy HTML resembling an alert email: navigation and footer links around the article entries.
+    """
+    rows = []
+    for i in range(articles):
+        doi = f"10.{rng.randint(1000, 9999)}/{rng.randint(10**6, 10**7)}"
+        if j_type == "acs":
+            link = f'<a href="https://click.acs.org/?qs={doi}&amp;i={i}" style="color:#0066cc"><span>Read Article</span></a>'
+        else:
+            link = f'<a href="https://link.aps.org/doi/{doi}?utm_source=m-email-utm-campaign-prl-alert">Title {i}</a>'
+        rows.append(
+            f"<tr><td style='padding:4px'><b>Paper {i}</b><br>Authors et al.<br>{link}"
+            f" <a href='https://example.org/abstract/{i}'>Abstract</a></td></tr>"
+        )
+    navigation = "".join(f"<a href='https://example.org/nav/{i}'>Section {i}</a> " for i in range(30))
+    heading = "<tr><td><h2>LETTERS</h2></td></tr>" if j_type == "aps" else ""
+    footer = "".join(f"<p><a href='https://example.org/footer/{i}'>Footer {i}</a></p>" for i in range(20))
+    return (
+        f"<html><head><style>td {{ font-family: Arial; }}</style></head><body>{navigation}"
+        f"<table>{heading}{''.join(rows)}</table>{footer}</body></html>"
+    )
+
+
+def _time_all(func, bodies, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for body in bodies:
+            func(body)
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", nargs="?")
+    parser.add_argument("--type", default="acs", choices=["acs", "aps"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--synthetic", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rng = random.Random(0)
+        bodies = [_synthetic_email(args.type, rng) for _ in range(args.synthetic)]
+        source = f"{args.synthetic} synthetic emails"
+    else:
+        corpus_dir = args.corpus_dir or f"data/email_corpus/{args.type}"
+        paths = [os.path.join(corpus_dir, f) for f in sorted(os.listdir(corpus_dir)) if f.lower().endswith(".html")]
+        if not paths:
+            print(f"❌ No saved emails found in {corpus_dir}.")
+            return
+        bodies = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                bodies.append(f.read())
+        source = f"{len(bodies)} emails from {corpus_dir}"
+
+    legacy = LEGACY[args.type]
+    expected = [legacy(body) for body in bodies]
+    candidates = {name: functools.partial(extract_links, j_type=args.type, backend=name) for name in BACKENDS}
+    for name, func in candidates.items():
+        mismatches = sum(func(body) != links for body, links in zip(bodies, expected))
+        if mismatches:
+            print(f"⚠️ Backend {name} differs from the previous implementation on {mismatches} emails.")
+
+    legacy_runs = _time_all(legacy, bodies, args.repeat)
+    print(f"📩 {source}, best of {args.repeat} runs:")
+    print(f"  {'legacy':<7}: {min(legacy_runs):.3f}s (median {statistics.median(legacy_runs):.3f}s)")
+    for name, func in candidates.items():
+        runs = _time_all(func, bodies, args.repeat)
+        print(
+            f"  {name:<7}: {min(runs):.3f}s (median {statistics.median(runs):.3f}s), "
+            f"speedup {min(legacy_runs) / min(runs):.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of util.pdftext.extract_section against the previous implementation
+(string concatenation over every page, full-document replace, then slicing).
+
+Usage:
+    python -m benchmarks.bench_pdftext [pdf_dir] [--type acs|aps] [--repeat N]
+
+pdf_dir defaults to data/<type>_summarized_pdfs.
+"""
+
+import os
+import time
+import argparse
+import statistics
+
+import fitz  # PyMuPDF
+
+from util.pdftext import extract_section
+
+
+def _legacy_extract_section(pdf_path, type="acs"):
+    text_content = ""
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            text_content += page.get_text() + " "
+
+    text_content = text_content.replace("\n", " ")
+
+    if type == "acs":
+        text_content = text_content[: text_content.find("REFERENCES")]
+    elif type == "aps":
+        text_content = text_content[: text_content.rfind("[1]")]
+
+    return text_content
+
+
+def _time_all(func, pdf_paths, j_type, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for pdf_path in pdf_paths:
+            func(pdf_path, j_type)
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf_dir", nargs="?")
+    parser.add_argument("--type", default="acs", choices=["acs", "aps"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pdf_dir = args.pdf_dir or f"data/{args.type}_summarized_pdfs"
+    pdf_paths = [os.path.join(pdf_dir, f) for f in sorted(os.listdir(pdf_dir)) if f.lower().endswith(".pdf")]
+    if not pdf_paths:
+        print(f"❌ No PDFs found in {pdf_dir}.")
+        return
+
+    legacy = _time_all(_legacy_extract_section, pdf_paths, args.type, args.repeat)
+    current = _time_all(extract_section, pdf_paths, args.type, args.repeat)
+
+    print(f"📄 {len(pdf_paths)} PDFs from {pdf_dir}, best of {args.repeat} runs:")
+    print(f"  legacy : {min(legacy):.3f}s (median {statistics.median(legacy):.3f}s)")
+    print(f"  current: {min(current):.3f}s (median {statistics.median(current):.3f}s)")
+    print(f"  speedup: {min(legacy) / min(current):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
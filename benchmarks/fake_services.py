@@ -0,0 +1,384 @@
+"""
+Local stand-ins for the external services of a run, used by benchmarks/bench_e2e.py:
+
+- FakeGmailService: the subset of the Gmail API service used by util.gmail, serving a fixed list of
+  message resources (synthetic alerts from alert_messages(), or messages recorded with format="full").
+- PublisherServer: tracking links that redirect to article pages, and the PDFs of those articles.
+- ChatServer: a chat-completions endpoint with configurable latency and rate of 429 responses.
+"""
+
+import re
+import json
+import time
+import base64
+import random
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fitz  # PyMuPDF
+
+from util.publishers import PUBLISHERS
+
+
+WORDS = (
+    "electron phonon lattice spin coupling quantum state energy band gap transport measurement sample "
+    "temperature magnetic field density functional theory simulation catalyst surface molecule bond reaction "
+    "yield solvent kinetic barrier spectrum resonance scattering crystal thin film interface defect doping "
+    "mobility carrier exciton photon cavity laser pulse optical response model parameter fit error analysis"
+).split()
+
+DOI_PREFIX = {"acs": "10.1021", "aps": "10.1103"}
+
+
+class _Request:
+    def __init__(self, result, latency):
+        self._result = result
+        self._latency = latency
+
+    def execute(self):
+        if self._latency:
+            time.sleep(self._latency)
+        return self._result() if callable(self._result) else self._result
+
+
+class _Batch:
+    def __init__(self, callback, latency):
+        self._callback = callback
+        self._latency = latency
+        self._requests = []
+
+    def add(self, request, request_id):
+        self._requests.append((request_id, request))
+
+    def execute(self):
+        # One round-trip for the whole batch, like the real batch endpoint.
+        if self._latency:
+            time.sleep(self._latency)
+        for request_id, request in self._requests:
+            self._callback(request_id, request._result, None)
+
+
+class FakeGmailService:
+    """
+    Serves messages.list (with "from:" and "is:unread" queries and paging), messages.get, batch requests,
+    getProfile and an empty history.list, sleeping `latency` seconds per request or batch.
+
+    Parameters:
+        messages (list): Message resources in the format="full" shape, newest first.
+        latency (float): Simulated round-trip time in seconds.
+    """
+
+    def __init__(self, messages, latency=0.0):
+        self.latency = latency
+        self._messages = list(messages)
+        self._by_id = {message["id"]: message for message in self._messages}
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def history(self):
+        return _History(self)
+
+    def _sender(self, message):
+        headers = message["payload"].get("headers", [])
+        return next((h["value"] for h in headers if h["name"].lower() == "from"), "")
+
+    def list(self, userId="me", labelIds=None, q="", maxResults=100, pageToken=None):
+        sender = re.search(r"from:(\S+)", q or "")
+        matching = [
+            {"id": m["id"], "threadId": m.get("threadId", m["id"])}
+            for m in self._messages
+            if (sender is None or sender.group(1) in self._sender(m))
+            and ("is:unread" not in (q or "") or "UNREAD" in m.get("labelIds", ["UNREAD"]))
+        ]
+        start = int(pageToken or 0)
+        result = {"messages": matching[start : start + maxResults], "resultSizeEstimate": len(matching)}
+        if start + maxResults < len(matching):
+            result["nextPageToken"] = str(start + maxResults)
+        return _Request(result, self.latency)
+
+    def get(self, userId="me", id=None, format="full", **kwargs):
+        return _Request(self._by_id[id], self.latency)
+
+    def getProfile(self, userId="me"):
+        return _Request({"emailAddress": "bench@example.org", "historyId": "1"}, self.latency)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(callback, self.latency)
+
+
+class _History:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, **kwargs):
+        return _Request({"historyId": "1"}, self._service.latency)
+
+
+def _alert_body(j_type, tracker_urls, rng):
+    """
+    HTML resembling the alert emails of a publisher, with navigation and footer links around the articles.
+    """
+    rows = []
+    for i, url in enumerate(tracker_urls):
+        title = " ".join(rng.choice(WORDS) for _ in range(8)).capitalize()
+        if j_type == "acs":
+            link = f'<a href="{url}" style="color:#0066cc"><span>Read Article</span></a>'
+        else:
+            link = f'<a href="{url}">{title}</a>'
+        rows.append(f"<tr><td style='padding:4px'><b>{title}</b><br>Authors et al.<br>{link}</td></tr>")
+    navigation = "".join(f"<a href='https://example.org/nav/{i}'>Section {i}</a> " for i in range(10))
+    heading = "<tr><td><h2>LETTERS</h2></td></tr>" if j_type == "aps" else ""
+    footer = "".join(f"<p><a href='https://example.org/footer/{i}'>Footer {i}</a></p>" for i in range(5))
+    return f"<html><body>{navigation}<table>{heading}{''.join(rows)}</table>{footer}</body></html>"
+
+
+def alert_messages(j_type, base_url, emails, links_per_email, seed=0):
+    """
+    Synthetic unread alert emails of a publisher, newest first, whose article links are tracking links
+    of the PublisherServer at base_url.
+
+    Returns:
+        tuple: (message resources, article ids in the order they are linked)
+    """
+    rng = random.Random(f"{seed}-{j_type}")
+    sender = PUBLISHERS[j_type]["sender"]
+    messages = []
+    articles = []
+    for e in range(emails):
+        ids = [f"{j_type}{e:03d}{k:02d}" for k in range(links_per_email)]
+        articles += ids
+        if j_type == "aps":
+            urls = [f"{base_url}/track/{j_type}/{i}?utm_campaign=m-email-utm-campaign-prl-alert" for i in ids]
+        else:
+            urls = [f"{base_url}/track/{j_type}/{i}" for i in ids]
+        body = _alert_body(j_type, urls, rng)
+        messages.append(
+            {
+                "id": f"{j_type}-{e:04d}",
+                "threadId": f"{j_type}-{e:04d}",
+                "labelIds": ["INBOX", "UNREAD"],
+                "payload": {
+                    "mimeType": "text/html",
+                    "headers": [
+                        {"name": "From", "value": sender},
+                        {"name": "Subject", "value": f"{j_type.upper()} alert {e}"},
+                        {"name": "Date", "value": formatdate(time.time() - e * 3600)},
+                    ],
+                    "body": {"data": base64.urlsafe_b64encode(body.encode("utf-8")).decode("ascii")},
+                },
+            }
+        )
+    return messages, articles
+
+
+def make_paper(j_type, article_id, pages=6, sample=None):
+    """
+    PDF bytes of a paper with text unique to article_id, so that neither the content hash nor the summary
+    cache treat two papers as the same. With sample (a PDF path), the sample is stamped with the id;
+    otherwise `pages` pages of filler text are generated, followed by the publisher's reference marker.
+    """
+    rng = random.Random(article_id)
+    if sample:
+        doc = fitz.open(sample)
+        doc[0].insert_text((36, 24), f"Benchmark paper {article_id}", fontsize=7)
+    else:
+        doc = fitz.open()
+        for page_number in range(pages):
+            page = doc.new_page()
+            words = [rng.choice(WORDS) for _ in range(600)]
+            text = f"{article_id} page {page_number + 1}. " + " ".join(words)
+            page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=9)
+        marker = PUBLISHERS[j_type].get("references") or "REFERENCES"
+        references = " ".join(
+            f"({i}) Author, A. J. Phys. {rng.randint(1, 99)}, {rng.randint(1, 999)}." for i in range(20)
+        )
+        doc.new_page().insert_textbox(fitz.Rect(50, 50, 545, 792), f"{marker} {references}", fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class _PublisherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        path = self.path.split("?")[0]
+        base = f"http://127.0.0.1:{server.server_port}"
+
+        match = re.fullmatch(r"/track/(\w+)/(\w+)", path)
+        if match:
+            j_type, article_id = match.groups()
+            doi = f"{DOI_PREFIX[j_type]}/bench.{article_id}"
+            if j_type == "aps":
+                location = f"{base}/prl/abstract/{doi}?utm_source=email"
+            else:
+                location = f"{base}/doi/{doi}"
+            return self._send(302, headers=[("Location", location)])
+
+        match = re.fullmatch(r"/(?:doi/pdf|prl/pdf)/\d+\.\d+/bench\.(\w+)", path)
+        if match and match.group(1) in server.papers:
+            server.count("pdf")
+            return self._send(200, server.papers[match.group(1)], [("Content-Type", "application/pdf")])
+
+        if re.fullmatch(r"/(?:doi|prl/abstract)/\d+\.\d+/bench\.\w+", path):
+            return self._send(200, b"<html><body>Article</body></html>", [("Content-Type", "text/html")])
+        return self._send(404)
+
+    do_HEAD = do_GET
+
+
+class PublisherServer(ThreadingHTTPServer):
+    """
+    Serves /track/<j_type>/<id> tracking links redirecting to ACS- and APS-shaped article URLs, and the PDFs
+    in `papers` (article id -> PDF bytes) at the URLs the publishers' pdf_url rewriters produce.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, papers, latency=0.0):
+        super().__init__(("127.0.0.1", 0), _PublisherHandler)
+        self.papers = papers
+        self.latency = latency
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if server.roll_429():
+            body = b'{"error": "rate limited"}'
+            self.send_response(429)
+            self.send_header("Retry-After", str(server.retry_after))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        prompt = "".join(message["content"] for message in payload["messages"])
+        prompt_tokens = len(prompt) // 4
+        cached_tokens = server.cached_prefix_tokens(payload["messages"])
+        time.sleep(server.sample_latency() + (prompt_tokens - cached_tokens) / 1000 * server.prefill_per_1k)
+        content = f"关键词: benchmark. Summary of {len(prompt)} characters."
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content),
+            "prompt_cache_hit_tokens": cached_tokens,
+            "prompt_cache_miss_tokens": prompt_tokens - cached_tokens,
+        }
+        server.count("ok")
+
+        if payload.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for i in range(0, len(content), 8):
+                chunk = {"choices": [{"delta": {"content": content[i : i + 8]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\ndata: [DONE]\n\n".encode())
+            self.close_connection = True
+            return
+
+        body = json.dumps(
+            {"choices": [{"message": {"role": "assistant", "content": content}}], "usage": usage}, ensure_ascii=False
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ChatServer(ThreadingHTTPServer):
+    """
+    Mock chat-completions endpoint answering after latency +/- jitter seconds (uniform), or with a 429 and
+    Retry-After: retry_after for a `rate_429` fraction of the requests. Streaming requests get SSE responses.
+
+    Prefix caching is modelled on the system message: a request whose system prompt was seen before reports
+    it as prompt_cache_hit_tokens, and only uncached prompt tokens add prefill_per_1k seconds per 1000 tokens.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=2.0, jitter=0.5, rate_429=0.0, retry_after=1, prefill_per_1k=0.05, seed=0):
+        super().__init__(("127.0.0.1", 0), _ChatHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.prefill_per_1k = prefill_per_1k
+        self.counts = {}
+        self._prefixes = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def roll_429(self):
+        with self._lock:
+            limited = self._rng.random() < self.rate_429
+        if limited:
+            self.count("429")
+        return limited
+
+    def cached_prefix_tokens(self, messages):
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else None
+        if system is None:
+            return 0
+        with self._lock:
+            seen = system in self._prefixes
+            self._prefixes.add(system)
+        return len(system) // 4 if seen else 0
+
+    def sample_latency(self):
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/v1/chat/completions"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
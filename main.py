@@ -1,92 +1,212 @@
-import os
-from datetime import datetime
-import sys
+"""
+Fetch journal alert emails from Gmail, download the papers they link to and summarize them.
+
+Usage:
+    python main.py [run]      [-j JOURNAL ...] [--max-num N] [--incremental] [--stream] [--digest] [--phased]
+    python main.py fetch      [-j JOURNAL ...] [--max-num N] [--incremental]
+    python main.py download   [-j JOURNAL ...]
+    python main.py summarize  [-j JOURNAL ...] [--stream] [--digest] [--max-tokens N] [--max-cost YUAN]
+    python main.py usage      [--by journal|day|model|run|paper ...] [--since YYYY-MM-DD] [--csv PATH]
 
-import GmailExtractor_acs
-import GmailExtractor_aps
-import Download_acs
-import Download_aps
-import SiliconFlow
+Each subcommand only imports what its stage needs, so e.g. a summary-only retry never loads Selenium
+or the Google client. Measure cold startup with: python -X importtime main.py <command> --help
 
+Every subcommand except `usage`, which only reads the ledger, accepts --metrics REPORT.json and
+--prometheus FILE.prom to time each stage (Gmail, redirects, downloads, PDF extraction, API calls)
+and count bytes, tokens and retries.
 
-ACS = True
-APS = True
+The tokens, latency and cost of every API request are kept in data/essay_summarizer.sqlite; `usage`
+prints rollups of it. --max-tokens / --max-cost stop a run from sending new papers once it has used
+that much; the remaining papers are picked up by the next run.
+"""
+
+import os
+import sys
+import argparse
+
+from util import metrics
+from util.publishers import PUBLISHERS, download_directory, processed_directory, summary_name
+
+
+J_TYPES = ["acs", "aps"]  # Publishers run by default, keys of util.publishers.PUBLISHERS
+MAX_NUM = 10  # Emails read per publisher
+INCREMENTAL = False  # Only fetch emails received since the last run (Gmail historyId checkpoint)
+STREAM = False  # Stream summaries into summary/.partial/ while they are generated
+DIGEST = False  # Also write a sorted, deduplicated Markdown/JSONL digest of each run into summary/
+MAX_TOKENS = None  # Tokens a run may spend on the API before it stops dispatching new papers, None for no cap
+MAX_COST = None  # Same, in yuan
+PIPELINE = True  # Run all publishers concurrently as one streaming fetch -> download -> summarize pipeline
+
+
+def _read_api_key():
+    with open("config/api.txt", "r") as f:
+        return f.readline()
+
+
+def fetch(args):
+    #  Step 1. Get downloading urls of all publishers from Gmail
+    import GmailExtractor
+
+    GmailExtractor.check_gmail(args.journals, max_num=args.max_num, incremental=args.incremental)
+
+
+def download(args):
+    #  Step 2. Downloading pdfs
+    import Download
+
+    Download.process_urls_and_download(args.journals)
+
+
+def summarize(args):
+    #  Step 3. Process the pdfs and give them to the LLM
+    import SiliconFlow
+
+    api_key = _read_api_key()
+    output_directory = os.path.join(os.getcwd(), "summary/")
+    os.makedirs(output_directory, exist_ok=True)
+
+    for j_type in args.journals:
+        os.makedirs(download_directory(j_type), exist_ok=True)
+        # Only unfinished papers are processed; failed ones are retried with backoff on later runs.
+        SiliconFlow.process_pdfs_in_directory(
+            download_directory(j_type),
+            processed_directory(j_type),
+            api_key,
+            output_directory,
+            output_name=summary_name(j_type),
+            j_type=j_type,
+            stream=args.stream,
+            digest=args.digest,
+            max_tokens=args.max_tokens,
+            max_cost=args.max_cost,
+        )
+
+
+USAGE_GROUPS = {"journal": "j_type", "day": "day", "model": "model", "run": "run_id", "paper": "paper"}
+
+
+def usage(args):
+    from util.usage_ledger import get_ledger
+
+    ledger = get_ledger()
+    if args.csv:
+        count = ledger.export_csv(args.csv, since=args.since)
+        print(f"📄 {count} requests written to {args.csv}")
+        return
+
+    columns = [USAGE_GROUPS[name] for name in args.by or ["journal", "day", "model"]]
+    rows = ledger.rollup(columns, since=args.since)
+    if not rows:
+        print("❌ No API requests recorded yet.")
+        return
+    header = [*columns, "requests", "papers", "prompt", "cached", "completion", "latency", "cost"]
+    table = [
+        [
+            *(str(row[c]) for c in columns),
+            str(row["requests"]),
+            str(row["papers"]),
+            str(row["prompt_tokens"]),
+            str(row["cached_tokens"]),
+            str(row["completion_tokens"]),
+            f"{row['mean_latency'] or 0:.1f}s",
+            f"¥{row['cost']:.4f}",
+        ]
+        for row in rows
+    ]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *table)]
+    for line in [header, *table]:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def run(args):
+    if args.phased:
+        fetch(args)
+        download(args)
+        summarize(args)
+        return
+
+    import pipeline
+
+    pipeline.run_pipeline(
+        args.journals,
+        _read_api_key(),
+        max_num=args.max_num,
+        incremental=args.incremental,
+        stream=args.stream,
+        digest=args.digest,
+        max_tokens=args.max_tokens,
+        max_cost=args.max_cost,
+    )
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "-j",
+        "--journal",
+        dest="journals",
+        action="append",
+        choices=sorted(PUBLISHERS),
+        help=f"publisher to process, may be repeated (default: {' '.join(J_TYPES)})",
+    )
+    common.add_argument("--metrics", metavar="PATH", help="write a JSON report of stage timings and counters")
+    common.add_argument("--prometheus", metavar="PATH", help="write the same metrics in Prometheus text format")
+    fetching = argparse.ArgumentParser(add_help=False)
+    fetching.add_argument("--max-num", type=int, default=MAX_NUM, help="emails read per publisher")
+    fetching.add_argument("--incremental", action="store_true", default=INCREMENTAL)
+    summarizing = argparse.ArgumentParser(add_help=False)
+    summarizing.add_argument("--stream", action="store_true", default=STREAM)
+    summarizing.add_argument(
+        "--digest", action="store_true", default=DIGEST, help="write a Markdown/JSONL digest of the run"
+    )
+    summarizing.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="token cap of the run")
+    summarizing.add_argument("--max-cost", type=float, default=MAX_COST, help="cost cap of the run, in yuan")
+
+    commands = {
+        "run": ([common, fetching, summarizing], run, "fetch, download and summarize (the default)"),
+        "fetch": ([common, fetching], fetch, "record the links of new alert emails"),
+        "download": ([common], download, "download the papers of recorded links"),
+        "summarize": ([common, summarizing], summarize, "summarize the downloaded papers"),
+        "usage": ([], usage, "show the token usage and cost of the API requests"),
+    }
+    for name, (parents, func, help_text) in commands.items():
+        subparser = subparsers.add_parser(name, parents=parents, help=help_text)
+        subparser.set_defaults(func=func)
+    subparsers.choices["run"].add_argument(
+        "--phased",
+        action="store_true",
+        default=not PIPELINE,
+        help="run the stages one after another instead of as one streaming pipeline",
+    )
+    reporting = subparsers.choices["usage"]
+    reporting.add_argument("--by", action="append", choices=list(USAGE_GROUPS), help="group by, may be repeated")
+    reporting.add_argument("--since", metavar="YYYY-MM-DD", help="only requests from this day on")
+    reporting.add_argument("--csv", metavar="PATH", help="export every request to a CSV file instead")
+    parser.set_defaults(journals=None, metrics=None, prometheus=None)
+
+    # No subcommand means "run", so a plain `python main.py` behaves as before.
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv = ["run", *argv]
+    args = parser.parse_args(argv)
+    args.journals = args.journals or J_TYPES
+    return args
+
+
+def main(argv=None):
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    if args.metrics or args.prometheus:
+        metrics.enable()
+    try:
+        args.func(args)
+    finally:
+        metrics.write_report(args.metrics, args.prometheus)
 
 
 if __name__ == "__main__":
 
     sys.stdout.reconfigure(encoding="utf-8")
 
-    ############################################
-    ####            ACS Journals            ####
-    ############################################
-    if ACS:
-        #  Step 1. Get downloading url from Gmail
-        with open("./data/acs_email_links.txt", "w") as f:
-            f.write("")
-        GmailExtractor_acs.check_gmail(max_num=10)
-
-        #  Step 2. Downloading pdfs
-        download_directory = os.path.abspath("./data/acs_downloaded_pdfs")
-        os.makedirs(download_directory, exist_ok=True)
-        Download_acs.process_urls_and_download("./data/acs_email_links.txt", download_directory)
-
-        #  Step 3. Process the pdfs and give them to the LLM
-        pdf_directory = os.path.abspath("./data/acs_downloaded_pdfs")
-
-        output_directory = os.path.join(os.getcwd(), "summary/")
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
-
-        output_name = f"acs-summary-{datetime.now().strftime('%Y-%m-%d')}.txt"
-
-        processed_dir_acs = "data/acs_summarized_pdfs"
-
-        with open("config/api.txt", "r") as f:
-            lines = f.readlines()
-        api_key = lines[0]
-
-        num_try = 0
-        patience = 5
-        while os.listdir(pdf_directory) and num_try < patience:
-            num_try += 1
-            SiliconFlow.process_pdfs_in_directory(
-                pdf_directory, processed_dir_acs, api_key, output_directory, output_name=output_name, j_type="acs"
-            )
-
-    ############################################
-    ####            APS Journals            ####
-    ############################################
-    if APS:
-        #  Step 1. Get downloading url from Gmail
-        with open("./data/aps_email_links.txt", "w") as f:
-            f.write("")
-        GmailExtractor_aps.check_gmail(max_num=10)
-
-        #  Step 2. Downloading pdfs
-        download_directory = os.path.abspath("./data/aps_downloaded_pdfs")
-        os.makedirs(download_directory, exist_ok=True)
-        Download_aps.process_urls_and_download("./data/aps_email_links.txt", download_directory)
-
-        #  Step 3. Process the pdfs and give them to the LLM
-        pdf_directory = os.path.abspath("./data/aps_downloaded_pdfs")
-
-        output_directory = os.path.join(os.getcwd(), "summary/")
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
-
-        output_name = f"aps-summary-{datetime.now().strftime('%Y-%m-%d')}.txt"
-
-        processed_dir_acs = "data/aps_summarized_pdfs"
-
-        with open("config/api.txt", "r") as f:
-            lines = f.readlines()
-        api_key = lines[0]
-
-        num_try = 0
-        patience = 5
-        while os.listdir(pdf_directory) and num_try < patience:
-            num_try += 1
-            SiliconFlow.process_pdfs_in_directory(
-                pdf_directory, processed_dir_acs, api_key, output_directory, output_name=output_name, j_type="aps"
-            )
+    main()
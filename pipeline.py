@@ -0,0 +1,202 @@
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import GmailExtractor
+import Download
+import SiliconFlow
+from util.manifest import get_manifest
+from util.publishers import download_directory, processed_directory, summary_name
+from util.siliconflow_client import AsyncSiliconFlowClient, API_URL
+from util.summary_writer import SummaryWriter
+from util.usage_ledger import get_ledger
+
+
+QUEUE_SIZE = 32  # Bound of the queues between stages, so a fast stage cannot run far ahead of a slow one
+DOWNLOAD_WORKERS = 5  # Shared by all publishers, equal to the size of the browser pool
+SUMMARY_WORKERS = 16  # Shared by all publishers; the API client caps the requests actually in flight
+
+_DONE = object()
+
+
+def _output_paths(j_type):
+    """
+    (processed_dir, output_dir, output_name) of a publisher's summaries.
+    """
+    return processed_directory(j_type), os.path.join(os.getcwd(), "summary/"), summary_name(j_type)
+
+
+async def _fetch_stage(j_types, links, queued_ids, max_num, incremental, io_pool):
+    """
+    Read the alert emails of all publishers over one Gmail connection in a worker thread, record their
+    links in the manifest and put every new link record on the queue as soon as its email is parsed.
+    """
+    loop = asyncio.get_running_loop()
+    manifest = get_manifest()
+
+    def _produce():
+        for j_type, message_id, subject, timestamp, email_links in GmailExtractor.iter_emails(
+            j_types, max_num=max_num, incremental=incremental
+        ):
+            manifest.add_email(j_type, message_id, subject, timestamp, email_links)
+            for record in manifest.query(j_type, message_id=message_id):
+                if record["id"] not in queued_ids:
+                    queued_ids.add(record["id"])
+                    # Blocks this thread while the queue is full.
+                    asyncio.run_coroutine_threadsafe(links.put(record), loop).result()
+
+    try:
+        await loop.run_in_executor(io_pool, _produce)
+    except Exception as e:
+        print(f"Error fetching emails: {e!r}")
+
+
+async def _download_worker(links, pdfs, engine, seen_dois, io_pool):
+    """
+    Resolve, deduplicate and download each link record, passing the PDF straight on to summarization.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        record = await links.get()
+        if record is _DONE:
+            return
+        j_type = record["j_type"]
+        try:
+            path = await loop.run_in_executor(
+                io_pool, Download.download_link, record, download_directory(j_type), engine, seen_dois
+            )
+            if path:
+                await pdfs.put((j_type, path))
+        except Exception as e:
+            print(f"Error downloading {record['raw_url']}: {e!r}")
+
+
+async def _summarize_worker(pdfs, client, extract_pool, writer, stream):
+    while True:
+        item = await pdfs.get()
+        if item is _DONE:
+            return
+        j_type, pdf_path = item
+        processed_dir, output_dir, output_name = _output_paths(j_type)
+        try:
+            await SiliconFlow.summarize_pdf(
+                pdf_path,
+                client,
+                extract_pool,
+                writer,
+                processed_dir,
+                output_dir,
+                output_name,
+                j_type=j_type,
+                stream=stream,
+            )
+        except Exception as e:
+            print(f"An error occurred while processing {os.path.basename(pdf_path)}: {e!r}")
+
+
+async def _run(j_types, api_key, max_num, incremental, stream, api_url, digest):
+    """
+    Run fetch -> download -> summarize for all publishers at once, with bounded queues between the stages.
+    Unfinished jobs of earlier runs (links not downloaded, PDFs not summarized) are picked up as well,
+    except those still backing off after a failure. All summaries go through one SummaryWriter.
+    """
+    writer = SummaryWriter(digest_dir=os.path.join(os.getcwd(), "summary/") if digest else None).start()
+    try:
+        await _run_stages(j_types, api_key, max_num, incremental, stream, api_url, writer)
+    finally:
+        await writer.close()
+
+
+async def _run_stages(j_types, api_key, max_num, incremental, stream, api_url, writer):
+    pending_pdfs = []
+    pending_links = []
+    for j_type in j_types:
+        processed_dir, output_dir, output_name = _output_paths(j_type)
+        download_dir = download_directory(j_type)
+        os.makedirs(download_dir, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
+        # Papers summarized before an earlier run stopped only need writing out.
+        SiliconFlow.finish_summarized_jobs(j_type, processed_dir, output_dir, output_name, writer)
+        # Listed before any download starts, so a freshly downloaded PDF is never queued twice.
+        pending_pdfs += [
+            (j_type, os.path.join(download_dir, f)) for f in os.listdir(download_dir) if f.lower().endswith(".pdf")
+        ]
+        pending_links += get_manifest().query(j_type)
+    queued_ids = {record["id"] for record in pending_links}
+
+    links = asyncio.Queue(maxsize=QUEUE_SIZE)
+    pdfs = asyncio.Queue(maxsize=QUEUE_SIZE)
+    seen_dois = set()  # Shared across publishers, so a paper in several feeds is downloaded once
+
+    async def _resume_pending():
+        for item in pending_pdfs:
+            await pdfs.put(item)
+        for record in pending_links:
+            await links.put(record)
+
+    io_pool = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS + 2)
+    try:
+        with ProcessPoolExecutor() as extract_pool:
+            async with AsyncSiliconFlowClient(api_key, url=api_url, max_connections=SUMMARY_WORKERS) as client:
+                summarizers = [
+                    asyncio.create_task(_summarize_worker(pdfs, client, extract_pool, writer, stream))
+                    for _ in range(SUMMARY_WORKERS)
+                ]
+
+                engine = Download.create_engine(pool_size=DOWNLOAD_WORKERS)
+                try:
+                    downloaders = [
+                        asyncio.create_task(_download_worker(links, pdfs, engine, seen_dois, io_pool))
+                        for _ in range(DOWNLOAD_WORKERS)
+                    ]
+                    resume = asyncio.create_task(_resume_pending())
+
+                    await _fetch_stage(j_types, links, queued_ids, max_num, incremental, io_pool)
+                    await resume
+                    for _ in downloaders:
+                        await links.put(_DONE)
+                    await asyncio.gather(*downloaders)
+                finally:
+                    await asyncio.get_running_loop().run_in_executor(io_pool, engine.close)
+
+                for _ in summarizers:
+                    await pdfs.put(_DONE)
+                await asyncio.gather(*summarizers)
+    finally:
+        io_pool.shutdown(wait=True)
+
+
+def run_pipeline(
+    j_types=("acs", "aps"),
+    api_key="",
+    max_num=10,
+    incremental=False,
+    stream=False,
+    api_url=API_URL,
+    digest=False,
+    max_tokens=None,
+    max_cost=None,
+):
+    """
+    Fetch, download and summarize all publishers at the same time as one streaming pipeline.
+
+    Each link flows into a download worker as soon as its email is parsed, and each PDF flows into
+    extraction and summarization as soon as it is on disk, so the end-to-end latency is bounded by
+    the slowest paper rather than by the sum of the phases. All publishers share one Gmail connection,
+    one browser pool and the same worker pools.
+
+    Parameters:
+        j_types (tuple): Publishers to run, keys of util.publishers.PUBLISHERS.
+        api_key (str): SiliconFlow API key.
+        max_num (int): Maximum number of emails to read per publisher.
+        incremental (bool): Only read emails received since the last run.
+        stream (bool): Stream summaries into summary/.partial/ while they are generated.
+        api_url (str): Chat-completions endpoint.
+        digest (bool): Also write a Markdown and JSONL digest of the run, sorted by journal and DOI, into summary/.
+        max_tokens (int): Stop dispatching new papers to the API once this run used this many tokens.
+        max_cost (float): Same, for the cost in yuan. Papers left over are picked up by the next run.
+    """
+    ledger = get_ledger()
+    ledger.set_cap(max_tokens, max_cost)
+    asyncio.run(_run(tuple(j_types), api_key, max_num, incremental, stream, api_url, digest))
+    ledger.report_run()
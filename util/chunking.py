@@ -0,0 +1,75 @@
+import re
+
+from util.siliconflow_client import estimate_tokens
+
+
+# Upper-case section headings as they appear in ACS and APS papers once newlines are flattened.
+SECTION_PATTERN = re.compile(
+    r"\b(?:INTRODUCTION|RESULTS AND DISCUSSION|RESULTS|DISCUSSION|EXPERIMENTAL SECTION|EXPERIMENTAL|"
+    r"MATERIALS AND METHODS|METHODS|COMPUTATIONAL DETAILS|THEORY|CONCLUSIONS?|SUMMARY|"
+    r"ASSOCIATED CONTENT|SUPPORTING INFORMATION|ACKNOWLEDGMENTS?)\b"
+)
+SENTENCE_END = re.compile(r"(?<=[.!?。])\s+")
+
+
+def split_sections(text: str) -> list:
+    """
+    Split text at upper-case section headings, keeping each heading with the section it opens.
+    """
+    starts = [0] + [m.start() for m in SECTION_PATTERN.finditer(text) if m.start() > 0]
+    sections = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+    return [section for section in sections if section.strip()]
+
+
+def _split_sentences(text: str, max_tokens: int) -> list:
+    """
+    Split an oversized section into pieces of at most max_tokens, cutting at sentence ends where possible.
+    """
+    pieces = []
+    current = []
+    current_tokens = 0
+    for sentence in SENTENCE_END.split(text):
+        tokens = estimate_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        # A single sentence longer than the budget (e.g. a flattened table) is cut by characters.
+        while tokens > max_tokens:
+            cut = len(sentence) * max_tokens // tokens
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+            tokens = estimate_tokens(sentence)
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def split_into_chunks(text: str, chunk_tokens: int) -> list:
+    """
+    Pack whole sections greedily into chunks of at most chunk_tokens, splitting only the sections
+    that are too large on their own.
+    """
+    chunks = []
+    current = ""
+    for section in split_sections(text):
+        pieces = [section] if estimate_tokens(section) <= chunk_tokens else _split_sentences(section, chunk_tokens)
+        for piece in pieces:
+            if current and estimate_tokens(current) + estimate_tokens(piece) > chunk_tokens:
+                chunks.append(current)
+                current = ""
+            # Pieces of a split section lost the whitespace they were cut at; sections still carry theirs.
+            if current and not current[-1].isspace() and not piece[:1].isspace():
+                current += " "
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """
+    Keep the beginning of the text up to max_tokens, ending on a sentence boundary.
+    """
+    return _split_sentences(text, max_tokens)[0]
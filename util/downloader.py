@@ -0,0 +1,292 @@
+import os
+import re
+import queue
+import shutil
+import tempfile
+import threading
+import urllib.parse
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+
+class _PdfArrivedHandler(FileSystemEventHandler):
+    """
+    Set an event as soon as a finished .pdf file appears in the watched staging directory.
+    Chrome writes to <name>.crdownload and renames it once the download is complete, so the
+    rename from .crdownload to .pdf is the completion signal. A .pdf that is created (or modified)
+    directly only counts once it is non-empty, starts with %PDF and has no .crdownload next to it,
+    since Chrome may create the final name as an empty placeholder before the rename. Each download
+    watches its own directory, so one worker's file never wakes up another.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.path = None
+
+    def _finish(self, path):
+        self.path = path
+        self.done.set()
+
+    @staticmethod
+    def _is_complete(path):
+        if os.path.exists(path + ".crdownload"):
+            return False
+        try:
+            with open(path, "rb") as f:
+                return f.read(4) == b"%PDF"
+        except OSError:
+            return False
+
+    def _check(self, path):
+        if path.lower().endswith(".pdf") and self._is_complete(path):
+            self._finish(path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._check(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory and not self.done.is_set():
+            self._check(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        if event.src_path.lower().endswith(".crdownload") and event.dest_path.lower().endswith(".pdf"):
+            self._finish(event.dest_path)
+        else:
+            self._check(event.dest_path)
+
+
+class BrowserPool:
+    """
+    A bounded pool of long-lived Chrome sessions.
+
+    Drivers are started lazily, up to `size`, and are handed back to the pool after each download
+    instead of being quit, so a batch of N papers costs at most `size` browser launches.
+    """
+
+    def __init__(self, size=3, headless=False):
+        self.size = size
+        self.headless = headless
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._drivers = []
+
+    def _new_driver(self):
+        chrome_options = Options()
+        chrome_options.add_argument("--disable-gpu")
+        if self.headless:
+            chrome_options.add_argument("--headless=new")
+        else:
+            chrome_options.add_argument("--window-size=1,1")
+            chrome_options.add_argument("--window-position=0,1280")
+
+        # Set preferences to automatically download PDFs instead of opening them.
+        prefs = {
+            "download.prompt_for_download": False,
+            "download.directory_upgrade": True,
+            "plugins.always_open_pdf_externally": True,
+        }
+        chrome_options.add_experimental_option("prefs", prefs)
+
+        driver = webdriver.Chrome(options=chrome_options)
+        self._drivers.append(driver)
+        return driver
+
+    @contextmanager
+    def session(self):
+        """
+        Borrow a driver from the pool, starting a new one if the pool has not reached its size yet.
+        A driver that raised while borrowed is quit and replaced on the next borrow.
+        """
+        driver = None
+        with self._lock:
+            if self._idle.empty() and self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                driver = self._new_driver()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        else:
+            driver = self._idle.get()
+
+        try:
+            yield driver
+        except Exception:
+            with self._lock:
+                self._created -= 1
+                self._drivers.remove(driver)
+            driver.quit()
+            raise
+        else:
+            self._idle.put(driver)
+
+    def close(self):
+        for driver in self._drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self._drivers.clear()
+
+
+class DownloadEngine:
+    """
+    Download PDFs through a shared BrowserPool, preferring a direct streamed HTTP fetch.
+
+    When `direct` is enabled, each URL is first fetched with a requests.Session carrying the cookies
+    and user agent of the pooled browsers. If the publisher answers with something other than a PDF
+    (login wall, bot challenge), the URL is downloaded through a pooled browser and its cookies are
+    copied into the session so that later direct fetches can succeed.
+    """
+
+    def __init__(self, pool_size=3, direct=True, headless=False):
+        self.pool = BrowserPool(size=pool_size, headless=headless)
+        self.direct = direct
+        self.http = requests.Session()
+        self.http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size * 2))
+        self._cookie_lock = threading.Lock()
+        self._observer = Observer()
+        self._observer.start()
+
+    def _sync_cookies(self, driver):
+        """
+        Copy all cookies and the user agent of a browser session into the HTTP session.
+        """
+        cookies = driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        user_agent = driver.execute_script("return navigator.userAgent")
+        with self._cookie_lock:
+            self.http.headers["User-Agent"] = user_agent
+            for cookie in cookies:
+                self.http.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+
+    def _direct_download(self, url, staging_dir, timeout):
+        """
+        Stream the PDF into the staging directory. Returns the file path, or None if the response is not a PDF.
+        """
+        try:
+            with self.http.get(url, stream=True, timeout=timeout) as response:
+                if response.status_code != 200:
+                    return None
+
+                chunks = response.iter_content(chunk_size=64 * 1024)
+                first_chunk = next(chunks, b"")
+                if not first_chunk.startswith(b"%PDF"):
+                    return None
+
+                path = os.path.join(staging_dir, _filename_from_response(response, url))
+                with open(path, "wb") as f:
+                    f.write(first_chunk)
+                    for chunk in chunks:
+                        f.write(chunk)
+                return path
+        except requests.exceptions.RequestException as e:
+            print(f"Direct download failed for {url}: {e}")
+            return None
+
+    def _browser_download(self, url, staging_dir, timeout, direct):
+        """
+        Download through a pooled Chrome session into the staging directory, returning as soon as
+        the finished PDF appears there.
+        """
+        handler = _PdfArrivedHandler()
+        watch = self._observer.schedule(handler, staging_dir, recursive=False)
+        try:
+            with self.pool.session() as driver:
+                driver.execute_cdp_cmd("Page.setDownloadBehavior", {"behavior": "allow", "downloadPath": staging_dir})
+                driver.get(url)
+                finished = handler.done.wait(timeout)
+                if direct:
+                    self._sync_cookies(driver)
+        finally:
+            self._observer.unschedule(watch)
+
+        return handler.path if finished else None
+
+    def download(self, url: str, download_dir: str, timeout: int = 60, direct: bool = None):
+        """
+        Download a PDF from the given URL into download_dir.
+
+        Parameters:
+            url (str): The direct PDF URL to download.
+            download_dir (str): The directory where the PDF will be saved.
+            timeout (int): Seconds to wait for the download to finish.
+            direct (bool): Overrides the engine's `direct` setting for this URL, so one engine can
+                serve publishers with different download strategies.
+
+        Returns:
+            str: Path of the downloaded file, or None if the download did not complete in time.
+        """
+        direct = self.direct if direct is None else direct
+        download_dir = os.path.abspath(download_dir)
+        staging_dir = _make_staging_dir(download_dir)
+
+        try:
+            staged_path = self._direct_download(url, staging_dir, timeout) if direct else None
+            if staged_path is None:
+                staged_path = self._browser_download(url, staging_dir, timeout, direct)
+
+            path = None
+            if staged_path:
+                # Same filesystem as download_dir, so the finished file appears there in one atomic step.
+                path = os.path.join(download_dir, os.path.basename(staged_path))
+                os.replace(staged_path, path)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        if path:
+            print(f"Download completed: {path}")
+        else:
+            print(f"Download did not complete within the timeout period for URL: {url}")
+        return path
+
+    def close(self):
+        self._observer.stop()
+        self._observer.join()
+        self.pool.close()
+        self.http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _make_staging_dir(download_dir):
+    """
+    Create a private staging directory for one download, next to download_dir
+    (e.g. data/.staging/ for data/aps_downloaded_pdfs/) so that partial files never show up in it.
+    """
+    staging_root = os.path.join(os.path.dirname(download_dir), ".staging")
+    os.makedirs(staging_root, exist_ok=True)
+    return tempfile.mkdtemp(prefix=os.path.basename(download_dir) + "-", dir=staging_root)
+
+
+def _filename_from_response(response, url):
+    """
+    Use the Content-Disposition filename if present, else the last path segment of the URL.
+    """
+    disposition = response.headers.get("Content-Disposition", "")
+    match = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', disposition)
+    if match:
+        name = urllib.parse.unquote(match.group(1))
+    else:
+        name = urllib.parse.urlsplit(url).path.rstrip("/").split("/")[-1]
+    name = os.path.basename(name)
+    return name if name.lower().endswith(".pdf") else f"{name}.pdf"
@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import random
+import threading
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from util import metrics
+
+
+SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
+TOKEN_PATH = "./config/token.json"
+CREDENTIALS_PATH = "./config/credentials.json"
+HTTP_TIMEOUT = 60
+PROXY = "http://127.0.0.1:7890"  # Only the Gmail and OAuth requests go through it; downloads and API calls do not
+
+BATCH_SIZE = 50  # Gmail allows 100 calls per batch, but recommends <= 50 to avoid rate limiting
+PAGE_SIZE = 500  # Upper bound the Gmail API accepts for messages.list
+BATCH_RETRIES = 4  # Follow-up batches for messages.get calls answered with 429 or 5xx inside a batch
+BATCH_BACKOFF = 1.0  # Seconds before the first follow-up batch, doubled on every further one
+
+
+def _save_token(creds):
+    """
+    Write the credentials to TOKEN_PATH, but only if the access or refresh token differs from the stored one.
+    """
+    if os.path.exists(TOKEN_PATH):
+        with open(TOKEN_PATH, "r") as token:
+            stored = json.load(token)
+        if stored.get("token") == creds.token and stored.get("refresh_token") == creds.refresh_token:
+            return
+    with open(TOKEN_PATH, "w") as token:
+        token.write(creds.to_json())
+
+
+def _load_credentials():
+    """
+    Uses local token.json if valid; otherwise uses credentials.json to create a new token.
+    """
+    creds = None
+    if os.path.exists(TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+
+    if not creds or not creds.valid:
+        # Imported here: a valid token needs neither the OAuth flow nor the requests transport.
+        import requests
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        proxies = {"http": PROXY, "https": PROXY}
+        if creds and creds.expired and creds.refresh_token:
+            session = requests.Session()
+            session.proxies.update(proxies)
+            creds.refresh(Request(session))
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
+            flow.oauth2session.proxies.update(proxies)
+            creds = flow.run_local_server(port=0)
+        _save_token(creds)
+
+    return creds
+
+
+_service = None
+_credentials = None
+_service_lock = threading.Lock()
+
+
+def _proxied_http():
+    """
+    httplib2 transport of the Gmail service, sending its requests through PROXY. The proxy is set on this
+    transport only rather than in os.environ, which every other HTTP client of the process would pick up.
+    """
+    return httplib2.Http(timeout=HTTP_TIMEOUT, proxy_info=httplib2.proxy_info_from_url(PROXY))
+
+
+def get_service():
+    """
+    Return the process-wide Gmail API service instance, authenticating and building it on first use.
+
+    The service is built from the discovery document bundled with googleapiclient (no network fetch)
+    over one authorized HTTP transport, which refreshes the access token by itself when it expires.
+    Like any httplib2 transport it must only be used by one thread at a time.
+    """
+    global _service, _credentials
+    with _service_lock:
+        if _service is None:
+            _credentials = creds = _load_credentials()
+            http = AuthorizedHttp(creds, http=_proxied_http())
+            _service = build("gmail", "v1", http=http, static_discovery=True, cache_discovery=False)
+    return _service
+
+
+def save_refreshed_token():
+    """
+    Persist the access token if the transport of the shared service refreshed it during the run.
+    """
+    with _service_lock:
+        if _credentials is not None:
+            _save_token(_credentials)
+
+
+def list_message_ids(service, query, max_num=None, label_ids=("INBOX",)):
+    """
+    List the IDs of all messages matching the query, following nextPageToken.
+
+    Parameters:
+        service: Gmail API service instance.
+        query (str): Gmail search query, e.g. "is:unread from:journals-comm@aps.org".
+        max_num (int): Maximum number of IDs to return. None means no limit.
+        label_ids (tuple): Labels the messages must carry.
+
+    Returns:
+        list: Message IDs, in the order returned by Gmail (newest first).
+    """
+    message_ids = []
+    page_token = None
+
+    while True:
+        page_size = PAGE_SIZE if max_num is None else min(PAGE_SIZE, max_num - len(message_ids))
+        results = (
+            service.users()
+            .messages()
+            .list(userId="me", labelIds=list(label_ids), q=query, maxResults=page_size, pageToken=page_token)
+            .execute()
+        )
+        message_ids.extend(msg["id"] for msg in results.get("messages", []))
+
+        page_token = results.get("nextPageToken")
+        if not page_token or (max_num is not None and len(message_ids) >= max_num):
+            break
+
+    return message_ids if max_num is None else message_ids[:max_num]
+
+
+def _status(exception):
+    return getattr(getattr(exception, "resp", None), "status", None)
+
+
+def _retryable(exception):
+    status = _status(exception)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def _execute_batch(service, message_ids, fmt, kwargs):
+    """
+    Fetch messages in one batch request.
+
+    Returns:
+        tuple: (fetched, errors), dicts mapping message IDs to message resources and to exceptions.
+    """
+    fetched = {}
+    errors = {}
+
+    def _callback(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = exception
+        else:
+            fetched[request_id] = response
+
+    batch = service.new_batch_http_request(callback=_callback)
+    for msg_id in message_ids:
+        request = service.users().messages().get(userId="me", id=msg_id, format=fmt, **kwargs)
+        batch.add(request, request_id=msg_id)
+    # Timed per batch: in the pipeline, fetching the messages is most of the Gmail time.
+    with metrics.timer("gmail_batch"):
+        batch.execute()
+    return fetched, errors
+
+
+def iter_messages(service, message_ids, batch_size=BATCH_SIZE, fmt="full", metadata_headers=None, failed=None):
+    """
+    Fetch messages with Gmail batch requests instead of one HTTP round-trip per message,
+    yielding each batch's messages as soon as that batch has completed.
+
+    Calls of a batch that Gmail answers with 429 (e.g. "too many concurrent requests") or 5xx are
+    sent again in smaller follow-up batches with exponential backoff, up to BATCH_RETRIES times.
+    Messages that no longer exist (404) are skipped.
+
+    Parameters:
+        service: Gmail API service instance.
+        message_ids (list): IDs of the messages to fetch.
+        batch_size (int): Number of messages.get calls packed into a single batch request.
+        fmt (str): Gmail message format, "full" or "metadata".
+        metadata_headers (list): Headers to include when fmt is "metadata".
+        failed (list): If given, the IDs of messages that still could not be fetched are appended to it
+            and the messages are skipped. Otherwise the first such failure is raised.
+
+    Yields:
+        dict: Message resources in the same order as message_ids.
+
+    Raises:
+        HttpError: If a message could not be fetched and no failed list was given.
+    """
+    kwargs = {"metadataHeaders": metadata_headers} if metadata_headers else {}
+
+    for start in range(0, len(message_ids), batch_size):
+        batch_ids = message_ids[start : start + batch_size]
+        fetched, errors = _execute_batch(service, batch_ids, fmt, kwargs)
+
+        retry_size = batch_size
+        for attempt in range(BATCH_RETRIES):
+            retry_ids = [msg_id for msg_id in batch_ids if msg_id in errors and _retryable(errors[msg_id])]
+            if not retry_ids:
+                break
+            retry_size = max(1, retry_size // 2)
+            delay = BATCH_BACKOFF * 2**attempt + random.uniform(0, BATCH_BACKOFF)
+            print(f"⚠️ Gmail rejected {len(retry_ids)} message fetches, retrying in {delay:.1f}s.")
+            metrics.count("gmail_retries", len(retry_ids))
+            time.sleep(delay)
+            for retry_start in range(0, len(retry_ids), retry_size):
+                retried, retry_errors = _execute_batch(
+                    service, retry_ids[retry_start : retry_start + retry_size], fmt, kwargs
+                )
+                fetched.update(retried)
+                errors.update(retry_errors)
+                for msg_id in retried:
+                    del errors[msg_id]
+
+        for msg_id in batch_ids:
+            if msg_id in fetched:
+                yield fetched[msg_id]
+            elif _status(errors[msg_id]) == 404:
+                print(f"⚠️ Message {msg_id} no longer exists, skipping.")
+            elif failed is None:
+                raise errors[msg_id]
+            else:
+                print(f"⚠️ Failed to fetch message {msg_id}: {errors[msg_id]}")
+                failed.append(msg_id)
+
+
+def batch_get_messages(service, message_ids, batch_size=BATCH_SIZE, fmt="full", metadata_headers=None, failed=None):
+    """
+    Fetch all messages with Gmail batch requests. See iter_messages.
+
+    Returns:
+        list: Message resources in the same order as message_ids.
+    """
+    return list(iter_messages(service, message_ids, batch_size, fmt, metadata_headers, failed))
+
+
+def load_history_checkpoint(checkpoint_path):
+    """
+    Read the last stored Gmail historyId, or None if no checkpoint exists yet.
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("historyId")
+
+
+def save_history_checkpoint(checkpoint_path, history_id):
+    """
+    Store the Gmail historyId atomically, so an interrupted write never leaves a corrupt checkpoint.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"historyId": history_id}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def list_added_message_ids(service, start_history_id, label_id="INBOX"):
+    """
+    List the IDs of messages added to the mailbox since start_history_id, following nextPageToken.
+
+    Raises:
+        HttpError: With status 404 if start_history_id is too old and Gmail no longer has the history.
+
+    Returns:
+        list: Message IDs, newest first (the same order messages.list uses).
+    """
+    message_ids = []
+    seen = set()
+    page_token = None
+
+    while True:
+        results = (
+            service.users()
+            .history()
+            .list(
+                userId="me",
+                startHistoryId=start_history_id,
+                historyTypes=["messageAdded"],
+                labelId=label_id,
+                pageToken=page_token,
+            )
+            .execute()
+        )
+        for record in results.get("history", []):
+            for added in record.get("messagesAdded", []):
+                msg_id = added["message"]["id"]
+                if msg_id not in seen:
+                    seen.add(msg_id)
+                    message_ids.append(msg_id)
+
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            break
+
+    return message_ids[::-1]
+
+
+def list_new_message_ids(service, query, sender, checkpoint_path, max_num=None):
+    """
+    List the messages to process in incremental mode.
+
+    If a historyId checkpoint exists, only messages added since then are listed with users.history.list
+    and filtered on the From header. Without a checkpoint, or when it has expired, this falls back to
+    the full messages.list query. max_num only caps the full listing; an incremental run always returns
+    everything since the checkpoint so that no mail is skipped when the checkpoint advances.
+
+    Parameters:
+        service: Gmail API service instance.
+        query (str): Query used for the full listing fallback.
+        sender (str): Address the alert emails are sent from.
+        checkpoint_path (str): File holding the last historyId.
+        max_num (int): Maximum number of IDs for the full listing. None means no limit.
+
+    Returns:
+        tuple: (message_ids, history_id) where history_id should be saved with save_history_checkpoint
+        once the messages have been processed. history_id is None if the headers of some added message
+        could not be fetched, so that the checkpoint stays put and the message is listed again next time.
+    """
+    history_id = service.users().getProfile(userId="me").execute()["historyId"]
+    start_history_id = load_history_checkpoint(checkpoint_path)
+
+    if start_history_id:
+        try:
+            added_ids = list_added_message_ids(service, start_history_id)
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            print("⚠️ Gmail history checkpoint expired, falling back to a full listing.")
+        else:
+            failed = []
+            headers_only = batch_get_messages(
+                service, added_ids, fmt="metadata", metadata_headers=["From"], failed=failed
+            )
+            message_ids = []
+            for msg_data in headers_only:
+                headers = msg_data["payload"]["headers"]
+                from_header = next((h["value"] for h in headers if h["name"] == "From"), "")
+                if sender in from_header:
+                    message_ids.append(msg_data["id"])
+            if failed:
+                print(f"⚠️ {len(failed)} new messages could not be checked, keeping the history checkpoint.")
+                return message_ids, None
+            return message_ids, history_id
+
+    return list_message_ids(service, query, max_num=max_num), history_id
@@ -0,0 +1,102 @@
+import re
+
+from util.publishers import PUBLISHERS
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # BeautifulSoup's html.parser is used instead
+    lxml = None
+
+
+XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")  # Rejected by lxml in str input
+
+
+def _keep(link_filter, href, get_text):
+    """
+    Apply the href and anchor-text conditions of a publisher's link filter; the text is only built when needed.
+    """
+    href_contains = link_filter.get("href_contains")
+    if href_contains is not None and href_contains not in href:
+        return False
+    anchor_text = link_filter.get("anchor_text")
+    return anchor_text is None or anchor_text.search(get_text()) is not None
+
+
+def _soup_links(body, link_filter):
+    from bs4 import BeautifulSoup, SoupStrainer  # Only needed without lxml, so not imported up front
+
+    marker_text = link_filter.get("after_marker")
+    if marker_text is None:
+        # Only the anchors are parsed, their text included.
+        soup = BeautifulSoup(body, "html.parser", parse_only=SoupStrainer("a", href=True))
+        anchors = soup.find_all("a", href=True)
+    else:
+        soup = BeautifulSoup(body, "html.parser")
+        markers = soup.find_all(string=lambda text: marker_text in text)
+        if not markers:
+            return None
+        anchors = markers[-1].parent.find_all_next("a", href=True)
+    return [link["href"] for link in anchors if _keep(link_filter, link["href"], link.get_text)]
+
+
+def _lxml_parse(body):
+    body = XML_DECLARATION.sub("", body, count=1)
+    return lxml.html.document_fromstring(body) if body.strip() else None
+
+
+def _lxml_links(body, link_filter):
+    marker_text = link_filter.get("after_marker")
+    try:
+        root = _lxml_parse(body)
+    except etree.ParserError:  # e.g. "Document is empty" for a comment-only or NUL-led body
+        return _soup_links(body, link_filter)
+    if root is None:
+        return [] if marker_text is None else None
+
+    if marker_text is None:
+        anchors = root.iter("a")
+    else:
+        elements = list(root.iter())
+        # Element holding the last text node that contains the marker; a tail belongs to the parent
+        # of the element it follows, and a comment's text to the element around the comment.
+        start = None
+        for element in elements:
+            if element.text and marker_text in element.text:
+                start = element.getparent() if isinstance(element, etree._Comment) else element
+            if element.tail and marker_text in element.tail:
+                start = element.getparent()
+        if start is None:
+            return None
+        # Every anchor after the marker's element in document order, its descendants included but not
+        # the element itself, as with BeautifulSoup's find_all_next.
+        anchors = (element for element in elements[elements.index(start) + 1 :] if element.tag == "a")
+
+    return [
+        link.get("href")
+        for link in anchors
+        if link.get("href") is not None and _keep(link_filter, link.get("href"), link.text_content)
+    ]
+
+
+BACKENDS = {"soup": _soup_links}
+if lxml is not None:
+    BACKENDS["lxml"] = _lxml_links
+DEFAULT_BACKEND = "lxml" if lxml is not None else "soup"
+
+
+def extract_links(body: str, j_type: str, backend: str = None):
+    """
+    Extract the article links from the HTML body of an alert email, using the link filter of the
+    publisher in util.publishers.PUBLISHERS (e.g. ACS: anchors whose text contains "Read Article";
+    APS: anchors after the last "LETTERS" heading carrying the PRL alert tracking parameter).
+
+    Parameters:
+        body (str): HTML body of the email.
+        j_type (str): Publisher key.
+        backend (str): Key of BACKENDS; defaults to lxml when installed, BeautifulSoup otherwise.
+
+    Returns:
+        list: The links in document order, or None if the publisher's marker is not in the email.
+    """
+    return BACKENDS[backend or DEFAULT_BACKEND](body, PUBLISHERS[j_type]["links"])
@@ -0,0 +1,191 @@
+import os
+import time
+
+from util import metrics
+from util.sqlite_store import DB_PATH, SqliteStore, process_wide
+
+
+# Lifecycle of a paper, in order. "skipped" marks papers already handled through another link and
+# "failed" papers that ran out of retries; both are terminal.
+STATES = ("discovered", "resolved", "downloaded", "extracted", "summarized", "written")
+TERMINAL = ("written", "skipped", "failed")
+STATUSES = STATES + ("skipped", "failed")
+PENDING = ("discovered", "resolved")
+
+MAX_RETRIES = 5
+RETRY_BACKOFF = 60  # Seconds before the first retry, doubled on every further failure
+
+_COLUMNS = {
+    "retries": "INTEGER NOT NULL DEFAULT 0",
+    "next_attempt": "REAL NOT NULL DEFAULT 0",
+    "error": "TEXT",
+    "summary": "TEXT",
+    "created": "REAL",  # When the link was recorded
+    "summarized": "REAL",  # When the summary arrived; minus "created", the latency of a paper
+}
+
+
+class LinkManifest(SqliteStore):
+    """
+    Durable per-paper job table: one record per link found in an alert email, holding the message id,
+    subject, timestamp, raw URL, resolved URL, DOI, downloaded path, summary and its state.
+
+    Records move through STATES with compare-and-set transitions, so a step that was interrupted is
+    simply redone and a step that completed is never repeated. Failed steps are retried with
+    exponential backoff up to MAX_RETRIES times. New links are buffered and inserted in bulk by flush();
+    a link already recorded for the same email is ignored.
+    """
+
+    TABLE = "links"
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS links ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, j_type TEXT NOT NULL, message_id TEXT NOT NULL, "
+        "subject TEXT, timestamp TEXT, raw_url TEXT NOT NULL, resolved_url TEXT, doi TEXT, path TEXT, "
+        "status TEXT NOT NULL DEFAULT 'discovered', updated REAL NOT NULL, "
+        + "".join(f"{name} {definition}, " for name, definition in _COLUMNS.items())
+        + "UNIQUE (j_type, message_id, raw_url))",
+        "CREATE INDEX IF NOT EXISTS links_status ON links (j_type, status)",
+        "CREATE INDEX IF NOT EXISTS links_path ON links (path)",
+    )
+    LEGACY_PATH = "./data/link_manifest.sqlite"
+
+    def __init__(self, path=DB_PATH, buffer_size=200):
+        self.buffer_size = buffer_size
+        self._buffer = []
+        super().__init__(path)
+
+    def _migrate(self):
+        # Columns added to _COLUMNS later, and records imported from a manifest older than the job states.
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(links)")}
+        for name, definition in _COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE links ADD COLUMN {name} {definition}")
+        self._conn.execute("UPDATE links SET status = 'discovered' WHERE status = 'found'")
+
+    def add_email(self, j_type, message_id, subject, timestamp, links):
+        """
+        Buffer the links of one email. They are written on the next flush(), or once the buffer is full.
+        """
+        now = time.time()
+        with self._lock:
+            self._buffer.extend((j_type, message_id, subject, str(timestamp), link, now, now) for link in links)
+            if len(self._buffer) >= self.buffer_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO links (j_type, message_id, subject, timestamp, raw_url, updated, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            self._buffer,
+        )
+        self._conn.commit()
+        self._buffer.clear()
+
+    def query(self, j_type, statuses=PENDING, message_id=None, due_only=True):
+        """
+        Return the records of a publisher in the given statuses as dicts, oldest first.
+        With due_only, records still backing off after a failure are left out.
+        """
+        sql = f"SELECT * FROM links WHERE j_type = ? AND status IN ({', '.join('?' * len(statuses))})"
+        params = [j_type, *statuses]
+        if message_id is not None:
+            sql += " AND message_id = ?"
+            params.append(message_id)
+        if due_only:
+            sql += " AND next_attempt <= ?"
+            params.append(time.time())
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(sql + " ORDER BY id", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, link_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM links WHERE id = ?", (link_id,)).fetchone()
+        return dict(row) if row else None
+
+    def job_for_pdf(self, j_type, pdf_path):
+        """
+        Return the record of the paper downloaded to pdf_path. A PDF that did not come through the
+        manifest (e.g. dropped into the download directory by hand) is registered as downloaded. If a
+        PDF of the same name was dropped there before and has since been moved on, its record is reset
+        to downloaded with the new path.
+        """
+        path = os.path.abspath(pdf_path)
+        raw_url = "file://" + path
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM links WHERE path = ? ORDER BY id DESC", (path,)).fetchone()
+            if row is None:
+                now = time.time()
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO links (j_type, message_id, raw_url, path, status, updated, created) "
+                    "VALUES (?, 'local', ?, ?, 'downloaded', ?, ?)",
+                    (j_type, raw_url, path, now, now),
+                )
+                self._conn.execute(
+                    "UPDATE links SET path = ?, status = 'downloaded', updated = ?, created = ?, retries = 0, "
+                    "next_attempt = 0, error = NULL, summary = NULL, summarized = NULL "
+                    "WHERE j_type = ? AND message_id = 'local' AND raw_url = ? AND path IS NOT ?",
+                    (path, now, now, j_type, raw_url, path),
+                )
+                self._conn.commit()
+                row = self._conn.execute("SELECT * FROM links WHERE path = ? ORDER BY id DESC", (path,)).fetchone()
+        return dict(row)
+
+    def transition(self, link_id, from_status, to_status, **fields):
+        """
+        Atomically move a record from from_status to to_status, optionally setting resolved_url, doi,
+        path or summary, and reset its retry counter. Moving to "summarized" also stamps the summarized time.
+
+        Returns:
+            bool: False if the record was no longer in from_status (another worker got there first).
+        """
+        assert to_status in STATUSES and set(fields) <= {"resolved_url", "doi", "path", "summary"}
+        now = time.time()
+        if to_status == "summarized":
+            fields["summarized"] = now
+        assignments = "".join(f", {name} = ?" for name in fields)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE links SET status = ?, updated = ?, retries = 0, next_attempt = 0, error = NULL"
+                f"{assignments} WHERE id = ? AND status = ?",
+                (to_status, now, *fields.values(), link_id, from_status),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def fail(self, link_id, error):
+        """
+        Record a failed step. The record keeps its state and becomes due again after an exponential
+        backoff, or is marked "failed" once it has failed MAX_RETRIES times.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT retries FROM links WHERE id = ?", (link_id,)).fetchone()
+            retries = row["retries"] + 1
+            metrics.count("job_failures")
+            if retries >= MAX_RETRIES:
+                metrics.count("jobs_failed")
+                self._conn.execute(
+                    "UPDATE links SET status = 'failed', retries = ?, error = ?, updated = ? WHERE id = ?",
+                    (retries, str(error), time.time(), link_id),
+                )
+            else:
+                next_attempt = time.time() + RETRY_BACKOFF * 2 ** (retries - 1)
+                self._conn.execute(
+                    "UPDATE links SET retries = ?, next_attempt = ?, error = ?, updated = ? WHERE id = ?",
+                    (retries, next_attempt, str(error), time.time(), link_id),
+                )
+            self._conn.commit()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+get_manifest = process_wide(LinkManifest)
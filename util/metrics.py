@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import nullcontext
+from datetime import datetime
+
+
+PREFIX = "essay_summarizer_"
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)  # Seconds, upper bounds of the histograms
+
+_NULL_TIMER = nullcontext()
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """
+    Counters and latency samples of one run. Safe to share between threads.
+
+    Timers keep every sample, which is cheap at the scale of a run (one sample per email, link or paper)
+    and gives exact percentiles; the Prometheus histogram buckets are computed from them when reporting.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._samples = {}
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, []).append(seconds)
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def state(self):
+        """
+        Raw counters and samples, as passed between processes by merge().
+        """
+        with self._lock:
+            return {"counters": dict(self._counters), "samples": {k: list(v) for k, v in self._samples.items()}}
+
+    def merge(self, state):
+        with self._lock:
+            for name, value in state["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            for name, samples in state["samples"].items():
+                self._samples.setdefault(name, []).extend(samples)
+
+    def report(self):
+        """
+        Summary of the run: every counter, and count, total, mean, p50, p95 and max seconds of every timer.
+        """
+        state = self.state()
+        timers = {}
+        for name, samples in sorted(state["samples"].items()):
+            timers[name] = {
+                "count": len(samples),
+                "total_seconds": sum(samples),
+                "mean_seconds": sum(samples) / len(samples),
+                "p50_seconds": _percentile(samples, 0.50),
+                "p95_seconds": _percentile(samples, 0.95),
+                "max_seconds": max(samples),
+                "buckets": {str(le): sum(1 for s in samples if s <= le) for le in BUCKETS},
+            }
+        return {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "wall_seconds": time.time() - self.started,
+            "counters": dict(sorted(state["counters"].items())),
+            "timers": timers,
+        }
+
+    def prometheus(self):
+        """
+        The report in the Prometheus text exposition format, e.g. for the node_exporter textfile collector.
+        """
+        report = self.report()
+        lines = []
+        for name, value in report["counters"].items():
+            metric = f"{PREFIX}{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, timer in report["timers"].items():
+            metric = f"{PREFIX}{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for le, count in timer["buckets"].items():
+                lines.append(f'{metric}_bucket{{le="{le}"}} {count}')
+            lines += [
+                f'{metric}_bucket{{le="+Inf"}} {timer["count"]}',
+                f"{metric}_sum {timer['total_seconds']}",
+                f"{metric}_count {timer['count']}",
+            ]
+        lines += [f"# TYPE {PREFIX}run_seconds gauge", f"{PREFIX}run_seconds {report['wall_seconds']}"]
+        return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    """
+    Records the duration of its block, and counts "<name>_errors" if the block raises.
+    """
+
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics.observe(self._name, time.perf_counter() - self._start)
+        if exc_type is not None:
+            self._metrics.count(f"{self._name}_errors")
+        return False
+
+
+_metrics = None  # None while disabled, so every hook costs one global lookup
+
+
+def enable():
+    """
+    Start recording metrics in this process. Until this is called, all hooks are no-ops.
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+def enabled():
+    return _metrics is not None
+
+
+def count(name, value=1):
+    if _metrics is not None:
+        _metrics.count(name, value)
+
+
+def timer(name):
+    """
+    Context manager timing its block under name.
+    """
+    if _metrics is None:
+        return _NULL_TIMER
+    return _metrics.timer(name)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function or coroutine function under name.
+    """
+
+    def decorator(func):
+        if _is_coroutine_function(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _metrics is None:
+                    return await func(*args, **kwargs)
+                with _metrics.timer(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _metrics is None:
+                return func(*args, **kwargs)
+            with _metrics.timer(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _is_coroutine_function(func):
+    # inspect is only imported when decorating, keeping this module free of heavy imports.
+    import inspect
+
+    return inspect.iscoroutinefunction(func)
+
+
+def _call_measured(func, *args):
+    """
+    Run func in a worker process with its own Metrics, returning (result, metrics state).
+    """
+    global _metrics
+    _metrics = Metrics()
+    try:
+        return func(*args), _metrics.state()
+    finally:
+        _metrics = None
+
+
+async def run_in_executor(pool, func, *args):
+    """
+    loop.run_in_executor(pool, func, *args) that, while metrics are enabled, also collects the metrics
+    func records inside a ProcessPoolExecutor worker, which would otherwise stay in that process.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    if _metrics is None:
+        return await loop.run_in_executor(pool, func, *args)
+    result, state = await loop.run_in_executor(pool, _call_measured, func, *args)
+    _metrics.merge(state)
+    return result
+
+
+def write_report(json_path=None, prometheus_path=None):
+    """
+    Write the metrics of the run as JSON to json_path and/or in the Prometheus text format to prometheus_path.
+    The Prometheus file is replaced atomically, so a scraper never reads it half-written.
+    """
+    if _metrics is None:
+        return
+    if json_path:
+        os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(_metrics.report(), f, indent=2)
+        print(f"📊 Metrics report written to {json_path}")
+    if prometheus_path:
+        os.makedirs(os.path.dirname(os.path.abspath(prometheus_path)), exist_ok=True)
+        with open(prometheus_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(_metrics.prometheus())
+        os.replace(prometheus_path + ".tmp", prometheus_path)
+        print(f"📊 Prometheus metrics written to {prometheus_path}")
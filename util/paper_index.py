@@ -0,0 +1,122 @@
+import os
+import re
+import time
+import hashlib
+
+from util.sqlite_store import SqliteStore, process_wide
+
+DOI_PATTERN = re.compile(r"10\.\d{4,9}/[^\s?#&]+")
+
+
+def doi_from_url(url):
+    """
+    Extract the DOI from a publisher URL, e.g.
+    https://journals.aps.org/prl/pdf/10.1103/PhysRevLett.134.098401 -> 10.1103/PhysRevLett.134.098401
+    Returns None if the URL carries no DOI.
+    """
+    if not url:
+        return None
+    match = DOI_PATTERN.search(url)
+    return match.group(0).rstrip("/").lower() if match else None
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class PaperIndex(SqliteStore):
+    """
+    DOI and content-hash index of every paper that has been downloaded or summarized, across all journals.
+    A paper is recorded with stage "downloaded" once its PDF is on disk and "summarized" once its summary
+    has been written.
+    """
+
+    TABLE = "papers"
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS papers ("
+        "sha256 TEXT PRIMARY KEY, doi TEXT, path TEXT NOT NULL, stage TEXT NOT NULL, updated REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS papers_doi ON papers (doi)",
+    )
+    LEGACY_PATH = "./data/paper_index.sqlite"
+
+    def has_doi(self, doi):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM papers WHERE doi = ?", (doi,)).fetchone()
+        return row is not None
+
+    def lookup(self, sha256):
+        """
+        Return (stage, path) for a known file hash, or (None, None).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT stage, path FROM papers WHERE sha256 = ?", (sha256,)).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def record(self, sha256, path, stage, doi=None):
+        """
+        Insert or update a paper. An existing DOI is kept if doi is None.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO papers (sha256, doi, path, stage, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET doi = COALESCE(excluded.doi, doi), path = excluded.path, "
+                "stage = excluded.stage, updated = excluded.updated",
+                (sha256, doi, os.path.abspath(path), stage, time.time()),
+            )
+            self._conn.commit()
+
+    def new_urls(self, urls, seen=None):
+        """
+        Drop download URLs whose DOI is already indexed or appears earlier in the list.
+        URLs without a recognizable DOI are always kept.
+
+        Parameters:
+            urls (list): Download URLs.
+            seen (set): DOIs already accepted, e.g. by an earlier call in the same run. Updated in place.
+        """
+        kept = []
+        seen = set() if seen is None else seen
+        for url in urls:
+            doi = doi_from_url(url)
+            if doi is not None:
+                if doi in seen or self.has_doi(doi):
+                    print(f"⏭️ Skipping {doi}: already downloaded.")
+                    continue
+                seen.add(doi)
+            kept.append(url)
+        return kept
+
+    def add_download(self, path, url):
+        """
+        Record a freshly downloaded PDF. If the same file content is already indexed at another path
+        that still exists, the new copy is deleted and False is returned.
+        """
+        sha256 = file_sha256(path)
+        _, known_path = self.lookup(sha256)
+        if known_path and known_path != os.path.abspath(path) and os.path.exists(known_path):
+            print(f"⏭️ {os.path.basename(path)} duplicates {known_path}, removing it.")
+            os.remove(path)
+            return False
+        self.record(sha256, path, "downloaded", doi=doi_from_url(url))
+        return True
+
+    def index_directory(self, directory, stage):
+        """
+        Hash and record every PDF in the directory that the index does not know yet at this path,
+        e.g. papers downloaded or summarized before the index existed.
+        """
+        if not os.path.isdir(directory):
+            return
+        with self._lock:
+            known = {row["path"] for row in self._conn.execute("SELECT path FROM papers")}
+        for filename in os.listdir(directory):
+            path = os.path.abspath(os.path.join(directory, filename))
+            if filename.lower().endswith(".pdf") and path not in known:
+                self.record(file_sha256(path), path, stage)
+
+
+get_index = process_wide(PaperIndex)
@@ -1,25 +1,131 @@
+import os
+import gzip
+import time
+import tempfile
+
 import fitz  # PyMuPDF
 
+from util import metrics
+from util.paper_index import file_sha256
+from util.publishers import PUBLISHERS
+
+TEXT_CACHE_DIR = "./data/text_cache"
+EXTRACTOR_VERSION = 1  # Bump when extract_section changes its output, to invalidate cached texts.
+TEXT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Compressed size above which the least recently used texts are removed
+TEXT_CACHE_MAX_AGE = 90 * 24 * 3600  # Seconds since last use after which a cached text is removed
+
+
+def _page_text(page):
+    """
+    Text of one page with newlines flattened, built from its text blocks (image blocks are skipped).
+    """
+    blocks = page.get_text("blocks")
+    return " ".join(block[4] for block in blocks if block[6] == 0).replace("\n", " ")
 
+
+@metrics.timed("extract_section")
 def extract_section(pdf_path, type="acs"):
-    text_content = ""
+    """
+    Extract the text of a paper up to its reference list, as marked in the publisher's entry of
+    util.publishers.PUBLISHERS.
+
+    With references_search "first" (ACS: "REFERENCES") the text is cut at the first marker, so pages after
+    it are never parsed. With "last" (APS: "[1]") it is cut at the last marker, found by scanning pages
+    backwards from the end. Publishers without a marker, and unknown types, return the full text.
+    """
+    publisher = PUBLISHERS.get(type, {})
+    marker = publisher.get("references")
+    pages = []
+    metrics.count("pdf_bytes", os.path.getsize(pdf_path))
     with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text_content += page.get_text() + " "
+        if marker and publisher["references_search"] == "first":
+            for page in doc:
+                text = _page_text(page)
+                ref_index = text.find(marker)
+                if ref_index != -1:
+                    pages.append(text[:ref_index])
+                    break
+                pages.append(text)
+
+        elif marker:
+            for page_number in range(doc.page_count - 1, -1, -1):
+                text = _page_text(doc[page_number])
+                ref_index = text.rfind(marker)
+                if ref_index != -1:
+                    pages = [_page_text(doc[i]) for i in range(page_number)]
+                    pages.append(text[:ref_index])
+                    break
+            else:
+                pages = [_page_text(page) for page in doc]
+
+        else:
+            pages = [_page_text(page) for page in doc]
+
+    return " ".join(pages)
+
+
+def _evict(cache_dir, max_bytes=TEXT_CACHE_MAX_BYTES, max_age=TEXT_CACHE_MAX_AGE):
+    """
+    Remove cached texts unused for more than max_age seconds, then the least recently used ones until
+    the cache holds at most max_bytes. Files removed concurrently by another worker are skipped.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".txt.gz"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in entries:
+        if total <= max_bytes and now - mtime <= max_age:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def extract_section_cached(pdf_path, type="acs", file_hash=None, cache_dir=TEXT_CACHE_DIR):
+    """
+    extract_section backed by a gzip-compressed text cache keyed on the PDF content hash, so that
+    retries and re-summarizations with another prompt or model skip PDF parsing. A hit decompresses
+    the whole text into memory and marks the file as recently used. The cache is kept within
+    TEXT_CACHE_MAX_BYTES and TEXT_CACHE_MAX_AGE by removing the least recently used texts after each write.
 
-    text_content = text_content.replace("\n", " ")
+    Parameters:
+        pdf_path (str): Path to the PDF file.
+        type (str): Journal type, as for extract_section.
+        file_hash (str): SHA-256 of the PDF if already known; computed otherwise.
+        cache_dir (str): Directory holding the cached texts.
+    """
+    file_hash = file_hash or file_sha256(pdf_path)
+    cache_path = os.path.join(cache_dir, f"{file_hash}.{type}.v{EXTRACTOR_VERSION}.txt.gz")
 
-    if type == "acs":
-        ref_marker = "REFERENCES"
-        ref_index = text_content.find(ref_marker)
-        text_content = text_content[:ref_index]
+    try:
+        with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+            text = f.read()
+        os.utime(cache_path)
+    except FileNotFoundError:  # Not cached, or just evicted by another worker
+        pass
+    else:
+        metrics.count("text_cache_hits")
+        return text
 
-    elif type == "aps":
-        ref_marker = "[1]"
-        ref_index = text_content.rfind(ref_marker)
-        text_content = text_content[:ref_index]
+    text = extract_section(pdf_path, type)
 
-    return text_content
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(text)
+    os.replace(tmp_path, cache_path)
+    _evict(cache_dir)
+    return text
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+import os
+import re
+import urllib.parse
+from datetime import datetime
+
+
+def _unchanged(url: str) -> str:
+    return url
+
+
+def _acs_pdf_url(url: str) -> str:
+    """
+    Convert an ACS article URL into its PDF download URL, e.g.
+    https://pubs.acs.org/doi/10.1021/acs.jcim.4c02240 -> https://pubs.acs.org/doi/pdf/10.1021/acs.jcim.4c02240?download=true
+    """
+    base_url = "https://pubs.acs.org/doi/pdf/"
+    if "doi/" in url:
+        doi = url.split("doi/")[1].split("?")[0]
+        return f"{base_url}{doi}?download=true"
+    return url
+
+
+def _aps_pdf_url(url: str) -> str:
+    """
+    Convert an APS abstract URL into a PDF URL, e.g.
+    https://journals.aps.org/prl/abstract/10.1103/PhysRevLett.134.098401?utm_source=email&utm_campaign=prl-alert
+    -> https://journals.aps.org/prl/pdf/10.1103/PhysRevLett.134.098401
+    """
+    parsed = urllib.parse.urlsplit(url)
+    new_path = parsed.path.replace("/abstract/", "/pdf/")
+    return f"{parsed.scheme}://{parsed.netloc}{new_path}"
+
+
+# One entry per publisher, keyed on the journal type used throughout (j_type):
+#   sender:            address of the alert emails, searched as "is:unread from:<sender>"
+#   links:             which anchors of an alert email are article links (see util.links.extract_links):
+#                        anchor_text   - compiled pattern the anchor text must match
+#                        href_contains - substring the URL must contain
+#                        after_marker  - only anchors after the last text containing this string
+#   pdf_url:           rewrites the URL an article link redirects to into the PDF URL
+#   direct_download:   try a plain HTTP fetch with the browser cookies before falling back to Chrome
+#   references:        marker of the reference list, where the text sent for summarization ends
+#   references_search: "first" cuts at the first marker, "last" at the last one (scanning from the end)
+PUBLISHERS = {
+    "acs": {
+        "sender": "journalalerts@acs.org",
+        "links": {"anchor_text": re.compile(r"\bRead Article\b", re.IGNORECASE)},
+        "pdf_url": _acs_pdf_url,
+        # pubs.acs.org sits behind a bot challenge, so the first download of a run goes through Chrome;
+        # the clearance cookies are then reused for direct fetches.
+        "direct_download": True,
+        "references": "REFERENCES",
+        "references_search": "first",
+    },
+    "aps": {
+        "sender": "journals-comm@aps.org",
+        "links": {"after_marker": "LETTERS", "href_contains": "m-email-utm-campaign-prl-alert"},
+        "pdf_url": _aps_pdf_url,
+        # journals.aps.org serves PDFs to a plain HTTP client once the session cookies are set.
+        "direct_download": True,
+        "references": "[1]",
+        "references_search": "last",
+    },
+}
+
+
+def register_publisher(
+    j_type: str,
+    sender: str,
+    links: dict,
+    pdf_url=None,
+    direct_download: bool = True,
+    references: str = None,
+    references_search: str = "first",
+):
+    """
+    Add a publisher to PUBLISHERS, making it available to every stage (Gmail, download, extraction).
+
+    Parameters:
+        j_type (str): Key of the new publisher, also used in data and summary file names.
+        sender (str): Address of the alert emails.
+        links (dict): Link filter, with the keys described above PUBLISHERS.
+        pdf_url (callable): URL rewrite from article page to PDF. None keeps the resolved URL.
+        direct_download (bool): Try a plain HTTP fetch before the browser.
+        references (str): Marker of the reference list. None sends the full text.
+        references_search (str): "first" or "last".
+    """
+    PUBLISHERS[j_type] = {
+        "sender": sender,
+        "links": links,
+        "pdf_url": pdf_url or _unchanged,
+        "direct_download": direct_download,
+        "references": references,
+        "references_search": references_search,
+    }
+
+
+def download_directory(j_type: str) -> str:
+    return os.path.abspath(f"./data/{j_type}_downloaded_pdfs")
+
+
+def processed_directory(j_type: str) -> str:
+    return f"data/{j_type}_summarized_pdfs"
+
+
+def summary_name(j_type: str) -> str:
+    return f"{j_type}-summary-{datetime.now().strftime('%Y-%m-%d')}.txt"
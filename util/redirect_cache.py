@@ -0,0 +1,86 @@
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from util.sqlite_store import DB_PATH, SqliteStore, process_wide
+
+
+CACHE_TTL = 30 * 24 * 3600  # Tracking links of alert emails stay valid for weeks; DOIs never change.
+
+
+class RedirectCache(SqliteStore):
+    """
+    Persistent sqlite map from tracking URL to the URL it finally redirects to, with a TTL.
+    """
+
+    TABLE = "redirects"
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS redirects (url TEXT PRIMARY KEY, resolved TEXT NOT NULL, created REAL NOT NULL)",
+    )
+    LEGACY_PATH = "./data/redirect_cache.sqlite"
+
+    def __init__(self, path=DB_PATH, ttl=CACHE_TTL):
+        self.ttl = ttl
+        super().__init__(path)
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT resolved, created FROM redirects WHERE url = ?", (url,)).fetchone()
+        if row is None or time.time() - row["created"] > self.ttl:
+            return None
+        return row["resolved"]
+
+    def set(self, url, resolved):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO redirects (url, resolved, created) VALUES (?, ?, ?)",
+                (url, resolved, time.time()),
+            )
+            self._conn.commit()
+
+
+_get_cache = process_wide(RedirectCache)
+_session = None
+_init_lock = threading.Lock()
+
+
+def _get_defaults():
+    global _session
+    with _init_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+            _session.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+    return _get_cache(), _session
+
+
+def resolve_redirect(url: str, timeout: int = 15) -> str:
+    """
+    Return the URL that the given tracking link finally redirects to.
+
+    Cached results are returned without any network access. Otherwise the redirect chain is followed
+    over a pooled session with a HEAD request, falling back to a streamed GET that is closed without
+    reading the body when HEAD does not redirect (some trackers only redirect GET, others reject HEAD).
+    Only URLs that actually redirected are cached, so a link that did not resolve is tried again next time.
+
+    Raises:
+        requests.exceptions.RequestException: If the URL cannot be reached.
+    """
+    cache, session = _get_defaults()
+
+    resolved = cache.get(url)
+    if resolved is not None:
+        return resolved
+
+    response = session.head(url, allow_redirects=True, timeout=timeout)
+    if response.url == url:
+        with session.get(url, allow_redirects=True, timeout=timeout, stream=True) as response:
+            pass
+    resolved = response.url
+
+    # The landing page may still answer 403 to a bot, but where it redirected to is all that matters here.
+    if resolved != url:
+        cache.set(url, resolved)
+    return resolved
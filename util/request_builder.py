@@ -0,0 +1,77 @@
+import os
+import threading
+
+
+PROMPTS_DIR = "./config/prompts"
+
+# Sampling parameters shared by every request. Together with the system prompt they form the part
+# of a payload that never changes within a run.
+STATIC_PARAMS = {
+    "stream": False,
+    "stop": ["null"],
+    "temperature": 0.3,
+    "top_p": 0.7,
+    "top_k": 50,
+    "frequency_penalty": 0.5,
+    "n": 1,
+    "response_format": {"type": "text"},
+}
+
+
+class RequestBuilder:
+    """
+    Builds chat-completions payloads from system prompts and static parameters that are prepared once
+    per run and shared by every request.
+
+    The API caches the key/value state of prompt prefixes it has seen recently, and a request only
+    benefits when it starts with exactly the same tokens. So every payload puts the static system
+    prompt first and the paper text last, and all requests of a journal and kind share the same
+    system prompt string: no per-request formatting, no timestamps. Cache hits show up as cached
+    tokens in the usage ledger.
+
+    Per-journal prompts are read from prompts_dir, falling back to the defaults:
+        <j_type>.txt      system prompt of the summary request
+        <j_type>.map.txt  system prompt of the requests summarizing one chunk of a long paper
+    A "{journal}" in a file is replaced with the journal type in capitals.
+
+    Parameters:
+        defaults (dict): Default system prompt per kind, e.g. {"summary": ..., "map": ...}.
+        prompts_dir (str): Directory holding the per-journal prompt files.
+    """
+
+    def __init__(self, defaults, prompts_dir=PROMPTS_DIR):
+        self.defaults = defaults
+        self.prompts_dir = prompts_dir
+        self._system_messages = {}
+        self._lock = threading.Lock()
+
+    def _load_prompt(self, j_type, kind):
+        suffix = "" if kind == "summary" else f".{kind}"
+        path = os.path.join(self.prompts_dir, f"{j_type}{suffix}.txt")
+        if not os.path.exists(path):
+            return self.defaults[kind]
+        with open(path, "r", encoding="utf-8") as f:
+            prompt = f.read().strip()
+        print(f"📝 Using the {kind} prompt of {j_type} from {path}")
+        return prompt.replace("{journal}", j_type.upper())
+
+    def system_message(self, j_type, kind="summary"):
+        """
+        The system message of a journal and kind, loaded on first use and then shared by all payloads.
+        """
+        key = (j_type, kind)
+        with self._lock:
+            if key not in self._system_messages:
+                self._system_messages[key] = {"role": "system", "content": self._load_prompt(j_type, kind)}
+            return self._system_messages[key]
+
+    def build(self, user_text, model, j_type="acs", kind="summary", max_tokens=2048):
+        """
+        Payload with the shared system message first and user_text last.
+        """
+        return {
+            "model": model,
+            "messages": [self.system_message(j_type, kind), {"role": "user", "content": user_text}],
+            "max_tokens": max_tokens,
+            **STATIC_PARAMS,
+        }
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from util import metrics
+
+
+# SILICONFLOW_API_URL points every client at another endpoint, e.g. the mock server of benchmarks/bench_e2e.py.
+API_URL = os.environ.get("SILICONFLOW_API_URL", "https://api.siliconflow.cn/v1/chat/completions")
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count used for rate limiting: about one token per CJK character
+    and one per four characters of everything else.
+    """
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket refilled continuously at `rate_per_minute`, holding at most that many tokens.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        # A single request larger than the bucket would otherwise wait forever.
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def _retry_after_seconds(response: httpx.Response):
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date. Returns None if absent.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncSiliconFlowClient:
+    """
+    Asyncio chat-completions client with a keep-alive connection pool, request/minute and token/minute
+    limits, and jittered exponential backoff on 429, 5xx and transport errors that honors Retry-After.
+
+    Parameters:
+        api_key (str): SiliconFlow API key.
+        url (str): Chat-completions endpoint; point it at a local server to test offline.
+        max_connections (int): Size of the connection pool, which also caps in-flight requests.
+        requests_per_minute (int): Request rate limit.
+        tokens_per_minute (int): Token rate limit (estimated prompt tokens plus max_tokens).
+        max_retries (int): Retries per request before the last response or error is returned.
+        timeout (float): Per-request timeout in seconds.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        url: str = API_URL,
+        max_connections: int = 16,
+        requests_per_minute: int = 1000,
+        tokens_per_minute: int = 1_000_000,
+        max_retries: int = 5,
+        timeout: float = 300,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ):
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self._client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {api_key.strip()}", "Content-Type": "application/json"},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+
+    def _backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = _retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    async def chat(self, payload: dict) -> str:
+        """
+        POST a chat-completions payload and return the raw response body.
+
+        Raises:
+            httpx.TransportError: If the request still fails at the transport level after all retries.
+        """
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in payload["messages"])
+        cost = prompt_tokens + payload.get("max_tokens", 0)
+
+        attempt = 0
+        while True:
+            await self.request_bucket.acquire()
+            await self.token_bucket.acquire(cost)
+            try:
+                response = await self._client.post(self.url, json=payload)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⚠️ Request failed ({e!r}), retrying in {delay:.1f}s.")
+                metrics.count("api_retries")
+            else:
+                if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                    return response.text
+                delay = self._backoff(attempt, response)
+                print(f"⚠️ API returned {response.status_code}, retrying in {delay:.1f}s.")
+                metrics.count("api_retries")
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def chat_stream(self, payload: dict, on_delta=None, stall_timeout: float = 60, on_retry=None) -> str:
+        """
+        POST a payload with "stream": true and consume the server-sent events as they arrive.
+
+        Parameters:
+            payload (dict): Chat-completions payload.
+            on_delta (callable): Called with every content fragment as soon as it is received.
+            stall_timeout (float): Seconds without a new event after which the generation is abandoned.
+            on_retry (callable): Called before the request is sent again, e.g. to discard the fragments
+                already passed to on_delta by a stream that broke off.
+
+        Returns:
+            str: A response body in the same shape as a non-streaming response, so that it can be checked,
+            cached and written like one. If the stream carried no choices, the raw body is returned.
+
+        Raises:
+            asyncio.TimeoutError: If the stream stalls for longer than stall_timeout.
+            httpx.TransportError: If the request still fails at the transport level after all retries.
+        """
+        payload = dict(payload, stream=True)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in payload["messages"])
+        cost = prompt_tokens + payload.get("max_tokens", 0)
+
+        attempt = 0
+        while True:
+            await self.request_bucket.acquire()
+            await self.token_bucket.acquire(cost)
+            try:
+                async with self._client.stream("POST", self.url, json=payload) as response:
+                    if response.status_code == 200:
+                        return await _collect_stream(response, on_delta, stall_timeout)
+
+                    await response.aread()
+                    if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                        return response.text
+                    delay = self._backoff(attempt, response)
+                    print(f"⚠️ API returned {response.status_code}, retrying in {delay:.1f}s.")
+                    metrics.count("api_retries")
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⚠️ Request failed ({e!r}), retrying in {delay:.1f}s.")
+                metrics.count("api_retries")
+
+            attempt += 1
+            await asyncio.sleep(delay)
+            if on_retry is not None:
+                on_retry()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+async def _collect_stream(response: httpx.Response, on_delta, stall_timeout: float) -> str:
+    content = []
+    raw_lines = []
+    usage = None
+    has_choices = False
+
+    lines = response.aiter_lines()
+    while True:
+        try:
+            line = await asyncio.wait_for(lines.__anext__(), stall_timeout)
+        except StopAsyncIteration:
+            break
+        raw_lines.append(line)
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            break
+
+        chunk = json.loads(data)
+        usage = chunk.get("usage") or usage
+        for choice in chunk.get("choices", []):
+            has_choices = True
+            delta = (choice.get("delta") or {}).get("content")
+            if delta:
+                content.append(delta)
+                if on_delta is not None:
+                    on_delta(delta)
+
+    if not has_choices:
+        return "\n".join(raw_lines)
+    message = {"role": "assistant", "content": "".join(content)}
+    return json.dumps({"choices": [{"message": message}], "usage": usage}, ensure_ascii=False)
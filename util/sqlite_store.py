@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+
+
+DB_PATH = "./data/essay_summarizer.sqlite"
+
+_connections = {}  # Absolute path -> (connection, lock)
+_connections_lock = threading.Lock()
+
+
+def connect(path=DB_PATH):
+    """
+    Return the connection to the sqlite database at path and the lock that serializes its use, opening
+    it on first use. Every store of the process on the same file shares both, so a commit never
+    interleaves with another store's statements.
+    """
+    path = os.path.abspath(path)
+    with _connections_lock:
+        if path not in _connections:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            _connections[path] = (conn, threading.RLock())
+        return _connections[path]
+
+
+def close(path=DB_PATH):
+    path = os.path.abspath(path)
+    with _connections_lock:
+        conn, lock = _connections.pop(path, (None, None))
+    if conn is not None:
+        with lock:
+            conn.close()
+
+
+class SqliteStore:
+    """
+    Base of the tables kept in the application database (DB_PATH): the link manifest, the paper index,
+    the summary and redirect caches and the usage ledger. Keeping them in one file lets them be read
+    together and backed up as one. Subclasses share the connection and lock returned by connect(), so
+    they are safe to share between threads.
+
+    Subclasses set:
+        TABLE: Name of their main table.
+        SCHEMA: CREATE statements, run on every open.
+        LEGACY_PATH: The database file the table was kept in before it moved to DB_PATH. Its rows are
+            imported once into an empty table, after which the file is renamed to <file>.imported.
+    """
+
+    TABLE = None
+    SCHEMA = ()
+    LEGACY_PATH = None
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._conn, self._lock = connect(path)
+        with self._lock:
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            self._import_legacy()
+            self._migrate()
+            self._conn.commit()
+
+    def _migrate(self):
+        """
+        Upgrade the schema or data of an existing table. Runs with the lock held, before the commit.
+        """
+
+    def _columns(self, schema):
+        return [row["name"] for row in self._conn.execute(f"PRAGMA {schema}.table_info({self.TABLE})")]
+
+    def _import_legacy(self):
+        legacy_path = self.LEGACY_PATH
+        if legacy_path is None or not os.path.exists(legacy_path):
+            return
+        if os.path.abspath(legacy_path) == os.path.abspath(self.path):
+            return
+        if self._conn.execute(f"SELECT 1 FROM {self.TABLE} LIMIT 1").fetchone() is not None:
+            return
+        self._conn.commit()  # ATTACH is not allowed inside a transaction
+        self._conn.execute("ATTACH DATABASE ? AS legacy", (legacy_path,))
+        try:
+            legacy_columns = set(self._columns("legacy"))
+            columns = ", ".join(name for name in self._columns("main") if name in legacy_columns)
+            imported = 0
+            if columns:
+                imported = self._conn.execute(
+                    f"INSERT OR IGNORE INTO main.{self.TABLE} ({columns}) SELECT {columns} FROM legacy.{self.TABLE}"
+                ).rowcount
+            self._conn.commit()
+        finally:
+            self._conn.execute("DETACH DATABASE legacy")
+        os.replace(legacy_path, legacy_path + ".imported")
+        print(f"📦 Imported {imported} {self.TABLE} from {legacy_path} into {self.path}.")
+
+    def close(self):
+        close(self.path)
+
+
+def process_wide(store_class):
+    """
+    Return a function that returns the process-wide instance of store_class, creating it on first use.
+    """
+    instance = None
+    lock = threading.Lock()
+
+    def get():
+        nonlocal instance
+        with lock:
+            if instance is None:
+                instance = store_class()
+        return instance
+
+    get.__doc__ = f"Return the process-wide {store_class.__name__}, creating it on first use."
+    return get
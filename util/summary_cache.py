@@ -0,0 +1,75 @@
+import json
+import time
+import hashlib
+
+from util.sqlite_store import DB_PATH, SqliteStore, process_wide
+
+
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(payload: dict) -> str:
+    """
+    Hash a chat-completions payload into a cache key.
+
+    The key covers the model, every message (so the prompt and the extracted text) and all sampling
+    parameters, so changing any of them is a cache miss. Streaming and non-streaming requests share
+    entries. Message contents are hashed first so the canonical JSON stays small.
+    """
+    keyed = {k: v for k, v in payload.items() if k != "stream"}
+    keyed["messages"] = [
+        {"role": m["role"], "content": hashlib.sha256(m["content"].encode("utf-8")).hexdigest()}
+        for m in payload["messages"]
+    ]
+    canonical = json.dumps(keyed, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SummaryCache(SqliteStore):
+    """
+    Persistent sqlite cache of successful API responses, evicting least recently used entries once
+    the stored responses exceed max_bytes.
+    """
+
+    TABLE = "responses"
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)",
+    )
+    LEGACY_PATH = "./data/summary_cache.sqlite"
+
+    def __init__(self, path=DB_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        super().__init__(path)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return row["response"]
+
+    def set(self, key, response):
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+get_cache = process_wide(SummaryCache)
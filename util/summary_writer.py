@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import shutil
+import asyncio
+from datetime import datetime
+
+from util import metrics
+from util.manifest import get_manifest
+from util.paper_index import get_index, file_sha256
+
+
+SEPARATOR = "#" + "-" * 120 + "#\n"
+
+
+def _format_block(pdf_name, content):
+    return f"Summary of {pdf_name}\n\n{content}\n\n{SEPARATOR}"
+
+
+def _order(entry):
+    """
+    Output order: by journal, then DOI; papers without a DOI last, by file name.
+    """
+    return entry["j_type"], entry["doi"] is None, entry["doi"] or "", entry["pdf_name"]
+
+
+class SummaryWriter:
+    """
+    The only writer of the summary files: summarization workers hand it finished summaries through an
+    asyncio queue and it appends them in batches.
+
+    A checkpoint is taken every checkpoint_size summaries, or once the queue has been idle for
+    checkpoint_interval seconds. At a checkpoint the batch is sorted by journal and DOI and appended
+    with one write per summary file, the files are fsynced, and only then are the PDFs moved and
+    the jobs marked "written". A summary already present in its file (an earlier run stopped
+    before recording it) is not written again.
+
+    With digest_dir, a Markdown and a JSONL digest of all summaries of the run, sorted by journal
+    and DOI and deduplicated, are written there on close().
+    """
+
+    def __init__(self, checkpoint_size=16, checkpoint_interval=5.0, digest_dir=None):
+        self.checkpoint_size = checkpoint_size
+        self.checkpoint_interval = checkpoint_interval
+        self.digest_dir = digest_dir
+        self.queue = asyncio.Queue()
+        self._buffer = []
+        self._written = {}  # Summary file -> names of the PDFs it already holds
+        self._run_entries = []
+        self._task = None
+
+    def add(self, job, content, processed_dir, output_dir, output_name, file_hash=None):
+        """
+        Buffer the summary of a job in state "summarized"; it is written at the next checkpoint.
+        """
+        self._buffer.append(
+            {
+                "job_id": job["id"],
+                "j_type": job["j_type"],
+                "doi": job["doi"],
+                "pdf_path": job["path"],
+                "pdf_name": os.path.basename(job["path"]),
+                "content": content,
+                "processed_dir": processed_dir,
+                "output_path": os.path.join(output_dir, output_name),
+                "file_hash": file_hash,
+            }
+        )
+
+    async def put(self, job, content, processed_dir, output_dir, output_name, file_hash=None):
+        await self.queue.put((job, content, processed_dir, output_dir, output_name, file_hash))
+
+    def _names_in(self, output_path):
+        """
+        Names of the PDFs already summarized in output_path, read from the file once and then kept up to date.
+        """
+        if output_path not in self._written:
+            names = set()
+            if os.path.exists(output_path):
+                with open(output_path, "r", encoding="utf-8") as summary_file:
+                    for line in summary_file:
+                        if line.startswith("Summary of "):
+                            names.add(line[len("Summary of ") :].rstrip("\n"))
+            self._written[output_path] = names
+        return self._written[output_path]
+
+    def flush(self):
+        """
+        Take a checkpoint: write, fsync and record every buffered summary.
+        """
+        if not self._buffer:
+            return
+        batch = sorted(self._buffer, key=_order)
+        self._buffer = []
+
+        by_file = {}
+        for entry in batch:
+            by_file.setdefault(entry["output_path"], []).append(entry)
+        for output_path, entries in by_file.items():
+            names = self._names_in(output_path)
+            blocks = []
+            for entry in entries:
+                if entry["pdf_name"] not in names:
+                    names.add(entry["pdf_name"])
+                    blocks.append(_format_block(entry["pdf_name"], entry["content"]))
+            if blocks:
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                with open(output_path, "a", encoding="utf-8") as summary_file:
+                    summary_file.write("".join(blocks))
+                    summary_file.flush()
+                    os.fsync(summary_file.fileno())
+
+        manifest = get_manifest()
+        index = get_index()
+        written = []
+        for entry in batch:
+            final_path = os.path.abspath(os.path.join(entry["processed_dir"], entry["pdf_name"]))
+            os.makedirs(entry["processed_dir"], exist_ok=True)
+            if os.path.exists(entry["pdf_path"]):
+                shutil.move(entry["pdf_path"], final_path)
+            if not manifest.transition(entry["job_id"], "summarized", "written", path=final_path):
+                print(f"⏭️ {entry['pdf_name']} is no longer summarized, another worker has written it.")
+                continue
+            if os.path.exists(final_path):
+                index.record(entry["file_hash"] or file_sha256(final_path), final_path, "summarized")
+            print(f"[{time.ctime().split()[3]}] Summary for {entry['pdf_name']} written to file.")
+            metrics.count("summaries_written")
+            written.append(entry)
+        print("-" * 120)
+        self._run_entries.extend(written)
+
+    async def run(self):
+        """
+        Consume the queue until close(), taking a checkpoint whenever the batch is full or the queue goes idle.
+        """
+        while True:
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout=self.checkpoint_interval)
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self.flush)
+                continue
+            if item is None:
+                await asyncio.to_thread(self.flush)
+                return
+            self.add(*item)
+            if len(self._buffer) >= self.checkpoint_size:
+                await asyncio.to_thread(self.flush)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+        return self
+
+    async def close(self):
+        """
+        Write the remaining summaries and, with digest_dir, the digest of the run.
+        """
+        if self._task is not None:
+            await self.queue.put(None)
+            await self._task
+        else:
+            self.flush()
+        if self.digest_dir:
+            self.write_digest()
+
+    def write_digest(self):
+        """
+        Write digest-<run time>.md and .jsonl with every summary of the run, one per paper (by DOI, or
+        file name without one), sorted by journal and DOI.
+        """
+        unique = {}
+        for entry in self._run_entries:
+            unique.setdefault((entry["j_type"], entry["doi"] or entry["pdf_name"]), entry)
+        entries = sorted(unique.values(), key=_order)
+        if not entries:
+            return
+
+        os.makedirs(self.digest_dir, exist_ok=True)
+        base = os.path.join(self.digest_dir, f"digest-{datetime.now().strftime('%Y-%m-%d-%H%M%S')}")
+        with open(base + ".jsonl", "w", encoding="utf-8") as f:
+            for entry in entries:
+                record = {key: entry[key] for key in ("j_type", "doi", "pdf_name", "content")}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        with open(base + ".md", "w", encoding="utf-8") as f:
+            j_type = None
+            for entry in entries:
+                if entry["j_type"] != j_type:
+                    j_type = entry["j_type"]
+                    f.write(f"# {j_type.upper()}\n\n")
+                title = entry["doi"] or entry["pdf_name"]
+                link = f"[{title}](https://doi.org/{entry['doi']})" if entry["doi"] else title
+                f.write(f"## {link}\n\n{entry['content']}\n\n")
+        print(f"📝 Digest of {len(entries)} summaries written to {base}.md")
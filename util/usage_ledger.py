@@ -0,0 +1,183 @@
+import csv
+import time
+from datetime import datetime
+
+from util import metrics
+from util.sqlite_store import DB_PATH, SqliteStore, process_wide
+
+
+# Price in yuan per million tokens: uncached prompt tokens, cached prompt tokens and completion tokens.
+# List prices at the time of writing; keep them in sync with https://siliconflow.cn/pricing.
+PRICES = {
+    "Pro/deepseek-ai/DeepSeek-V3": {"prompt": 2.0, "cached": 2.0, "completion": 8.0},
+    "deepseek-ai/DeepSeek-V3": {"prompt": 2.0, "cached": 2.0, "completion": 8.0},
+}
+DEFAULT_PRICE = {"prompt": 2.0, "cached": 2.0, "completion": 8.0}
+
+ROLLUP_KEYS = ("run_id", "day", "j_type", "model", "paper")
+
+
+def parse_usage(usage):
+    """
+    (prompt, completion, cached) token counts of a response's usage block. Cached prompt tokens are read
+    from the DeepSeek field (prompt_cache_hit_tokens) or the OpenAI one (prompt_tokens_details.cached_tokens).
+    """
+    usage = usage or {}
+    cached = usage.get("prompt_cache_hit_tokens")
+    if cached is None:
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0, cached or 0
+
+
+def request_cost(model, prompt_tokens, completion_tokens, cached_tokens):
+    price = PRICES.get(model, DEFAULT_PRICE)
+    return (
+        (prompt_tokens - cached_tokens) * price["prompt"]
+        + cached_tokens * price["cached"]
+        + completion_tokens * price["completion"]
+    ) / 1_000_000
+
+
+class UsageLedger(SqliteStore):
+    """
+    Persistent sqlite ledger of the token usage, latency and cost of every API request, with rollups
+    per run, day, journal, model or paper.
+
+    A cap (set_cap) on the tokens or cost of the current run makes cap_reached() return True once it
+    is hit, which the summarization stages check before dispatching a new paper. Requests already in
+    flight still complete, so a run can overshoot the cap by up to one paper per worker.
+    """
+
+    TABLE = "requests"
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS requests ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL, time REAL NOT NULL, day TEXT NOT NULL, "
+        "j_type TEXT, model TEXT, paper TEXT, kind TEXT, prompt_tokens INTEGER NOT NULL, "
+        "completion_tokens INTEGER NOT NULL, cached_tokens INTEGER NOT NULL, latency REAL, cost REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS requests_day ON requests (day)",
+    )
+    LEGACY_PATH = "./data/usage_ledger.sqlite"
+
+    def __init__(self, path=DB_PATH):
+        self.run_id = datetime.now().strftime("%Y-%m-%d-%H%M%S")
+        self.run_totals = {"requests": 0, "prompt": 0, "cached": 0, "completion": 0}
+        self.run_cost = 0.0
+        self.max_tokens = None
+        self.max_cost = None
+        super().__init__(path)
+
+    def record(self, usage, model, latency, j_type=None, paper=None, kind="summary"):
+        """
+        Record one API request from the usage block of its response.
+
+        Parameters:
+            usage (dict): The "usage" object of the response (may be None).
+            model (str): Model the request was sent to.
+            latency (float): Seconds from sending the request to the complete response, retries included.
+            j_type (str): Journal of the paper.
+            paper (str): DOI or file name of the paper.
+            kind (str): "summary" for the request producing the summary, "map" for a chunk of a long paper.
+        """
+        prompt_tokens, completion_tokens, cached_tokens = parse_usage(usage)
+        cost = request_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO requests (run_id, time, day, j_type, model, paper, kind, prompt_tokens, "
+                "completion_tokens, cached_tokens, latency, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.run_id,
+                    now,
+                    time.strftime("%Y-%m-%d", time.localtime(now)),
+                    j_type,
+                    model,
+                    paper,
+                    kind,
+                    prompt_tokens,
+                    completion_tokens,
+                    cached_tokens,
+                    latency,
+                    cost,
+                ),
+            )
+            self._conn.commit()
+            self.run_totals["requests"] += 1
+            self.run_totals["prompt"] += prompt_tokens
+            self.run_totals["cached"] += cached_tokens
+            self.run_totals["completion"] += completion_tokens
+            self.run_cost += cost
+
+        metrics.count("tokens_in", prompt_tokens)
+        metrics.count("tokens_out", completion_tokens)
+        metrics.count("tokens_cached", cached_tokens)
+
+    def set_cap(self, max_tokens=None, max_cost=None):
+        """
+        Cap the prompt plus completion tokens and/or the cost in yuan of this run. None means no cap.
+        """
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+
+    def cap_reached(self):
+        with self._lock:
+            run_tokens = self.run_totals["prompt"] + self.run_totals["completion"]
+            return (self.max_tokens is not None and run_tokens >= self.max_tokens) or (
+                self.max_cost is not None and self.run_cost >= self.max_cost
+            )
+
+    def report_run(self):
+        """
+        Print the usage of this run so far, including how much of the prompts the API served from its prefix cache.
+        """
+        with self._lock:
+            totals = dict(self.run_totals)
+            cost = self.run_cost
+        if not totals["requests"]:
+            return
+        hit_rate = totals["cached"] / totals["prompt"] if totals["prompt"] else 0.0
+        print(
+            f"🧮 {totals['requests']} API requests this run: {totals['prompt']} prompt tokens "
+            f"({totals['cached']} from the prefix cache, {hit_rate:.0%}), {totals['completion']} completion tokens, "
+            f"¥{cost:.4f}"
+        )
+
+    def rollup(self, by=("j_type", "day", "model"), since=None):
+        """
+        Totals grouped by the given columns (any of ROLLUP_KEYS), optionally only for days >= since.
+
+        Returns:
+            list: One dict per group with requests, papers, prompt, completion and cached tokens,
+            mean latency and cost, ordered by the grouping columns.
+        """
+        assert by and set(by) <= set(ROLLUP_KEYS)
+        columns = ", ".join(by)
+        sql = (
+            f"SELECT {columns}, COUNT(*) AS requests, COUNT(DISTINCT paper) AS papers, "
+            "SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens, "
+            "SUM(cached_tokens) AS cached_tokens, AVG(latency) AS mean_latency, SUM(cost) AS cost FROM requests"
+        )
+        params = []
+        if since:
+            sql += " WHERE day >= ?"
+            params.append(since)
+        with self._lock:
+            rows = self._conn.execute(f"{sql} GROUP BY {columns} ORDER BY {columns}", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def export_csv(self, csv_path, since=None):
+        """
+        Write every recorded request (optionally only days >= since) to a CSV file.
+        """
+        sql = "SELECT * FROM requests" + (" WHERE day >= ?" if since else "") + " ORDER BY id"
+        with self._lock:
+            cursor = self._conn.execute(sql, [since] if since else [])
+            rows = cursor.fetchall()
+            header = [column[0] for column in cursor.description]
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(tuple(row) for row in rows)
+        return len(rows)
+
+
+get_ledger = process_wide(UsageLedger)